@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the github org client utilities.
+
+Synthetic payloads are scaled from ``fixtures.TEST_PAYLOAD``. Every case
+reports the best wall time, throughput, peak traced memory and the
+number of memory blocks still allocated afterwards.
+
+    python benchmarks.py                          # 10k and 100k repos
+    python benchmarks.py --sizes 10000 1000000    # pick sizes
+    python benchmarks.py --save baseline.json     # store a baseline
+    python benchmarks.py --compare baseline.json  # exit 1 on regression
+"""
+import argparse
+import io
+import json
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict, Iterator, List
+
+import requests
+
+from client import GithubOrgClient, RepoIndex, RepoSummary
+from fixtures import TEST_PAYLOAD
+from utils import (
+    access_nested_map,
+    access_nested_maps,
+    get_json,
+    iter_json,
+    locked_memoize,
+    memoize,
+)
+
+LICENSE_PATH = ("license", "key")
+URL = "https://api.github.com/orgs/google/repos"
+
+
+def scaled_repos(count: int) -> List[Dict]:
+    """Repeat the fixture repos until ``count`` repos are available"""
+    repos = TEST_PAYLOAD[0][1]
+    return [repos[i % len(repos)] for i in range(count)]
+
+
+def scaled_body(count: int, chunk_size: int = 65536) -> Iterator[bytes]:
+    """JSON body of ``count`` fixture repos with unique names, produced
+    in chunks so large sizes never exist in memory at once"""
+    templates = [
+        json.dumps(dict(repo, name="{name}")).encode().split(b"{name}")
+        for repo in TEST_PAYLOAD[0][1]
+    ]
+    buffer = [b"["]
+    size = 1
+    for i in range(count):
+        prefix, suffix = templates[i % len(templates)]
+        item = b"".join((b"," if i else b"", prefix, b"repo-%d" % i, suffix))
+        buffer.append(item)
+        size += len(item)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    buffer.append(b"]")
+    yield b"".join(buffer)
+
+
+class BodySession:
+    """Session serving a synthetic body through ``requests.Response``,
+    so decoding costs match real responses"""
+
+    def __init__(self, count: int) -> None:
+        """Init method of BodySession"""
+        self.count = count
+
+    def get(self, url: str, stream: bool = False) -> requests.Response:
+        """Response carrying ``count`` synthetic repos"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.raw = io.BytesIO()
+        if stream:
+            response.iter_content = lambda chunk_size=1: scaled_body(
+                self.count, chunk_size
+            )
+        else:
+            response._content = b"".join(scaled_body(self.count))
+        return response
+
+
+def baseline_license_keys(repos: List[Dict]) -> List:
+    """Extract license keys the way has_license used to"""
+    keys = []
+    for repo in repos:
+        try:
+            keys.append(access_nested_map(repo, LICENSE_PATH))
+        except KeyError:
+            keys.append(None)
+    return keys
+
+
+class Memoized:
+    """Holder of one memoize and one locked_memoize property"""
+
+    @memoize
+    def plain(self):
+        """Constant behind ``memoize``"""
+        return 42
+
+    @locked_memoize
+    def locked(self):
+        """Constant behind ``locked_memoize``"""
+        return 42
+
+
+def repos_payload(size: int, **kwargs) -> List:
+    """Load a synthetic repos payload the way GithubOrgClient does"""
+    client = GithubOrgClient("google", session=BodySession(size), **kwargs)
+    client.org = {"repos_url": URL}
+    return client.repos_payload
+
+
+def cases(size: int, max_full: int) -> Dict[str, Callable[[], object]]:
+    """Benchmark callables for ``size`` repos, keyed by case name"""
+    repos = scaled_repos(size)
+    memoized = Memoized()
+    client = GithubOrgClient("google")
+    client.repos_payload = repos
+    client.repos_index
+    found = {
+        "access_nested_map": lambda: baseline_license_keys(repos),
+        "access_nested_maps": lambda: access_nested_maps(
+            repos, LICENSE_PATH, default=None
+        ),
+        "memoize": lambda: [memoized.plain for _ in range(size)],
+        "locked_memoize": lambda: [memoized.locked for _ in range(size)],
+        "iter_json": lambda: list(iter_json(
+            URL, GithubOrgClient.REPO_PATHS, session=BodySession(size)
+        )),
+        "public_repos.index": lambda: RepoIndex(repos),
+        "public_repos.license": lambda: client.public_repos(
+            license="apache-2.0"
+        ),
+    }
+    if size <= max_full:
+        found["get_json"] = lambda: get_json(URL, session=BodySession(size))
+        found["repos_payload.full"] = lambda: repos_payload(size)
+        found["repos_payload.compact"] = lambda: repos_payload(
+            size, summary_type=RepoSummary
+        )
+    return found
+
+
+def measure(fn: Callable[[], object], items: int, repeat: int) -> Dict:
+    """Time, throughput and memory figures for one case"""
+    seconds = min(timeit.repeat(fn, repeat=repeat, number=1))
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = fn()
+        after = tracemalloc.take_snapshot()
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    blocks = sum(
+        stat.count_diff for stat in after.compare_to(before, "filename")
+    )
+    return {
+        "seconds": seconds,
+        "items_per_second": items / seconds if seconds else float("inf"),
+        "peak_bytes": peak,
+        "held_bytes": held,
+        "blocks": blocks,
+    }
+
+
+def run(sizes: List[int], repeat: int, max_full: int) -> Dict[str, Dict]:
+    """Run every case for every size and print a table"""
+    results = {}
+    print("{:<32} {:>10} {:>14} {:>10} {:>10} {:>10}".format(
+        "case", "ms", "items/s", "peak MB", "held MB", "blocks"))
+    for size in sizes:
+        for name, fn in cases(size, max_full).items():
+            key = "{}[{}]".format(name, size)
+            results[key] = stats = measure(fn, size, repeat)
+            print("{:<32} {:>10.2f} {:>14,.0f} {:>10.2f} {:>10.2f} {:>10}"
+                  .format(key, stats["seconds"] * 1000,
+                          stats["items_per_second"],
+                          stats["peak_bytes"] / 1e6,
+                          stats["held_bytes"] / 1e6, stats["blocks"]))
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict],
+            tolerance: float) -> List[str]:
+    """Cases whose time or peak memory grew beyond ``tolerance``"""
+    regressions = []
+    for key, stats in results.items():
+        if key not in baseline:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            old, new = baseline[key][metric], stats[metric]
+            if old and new > old * (1 + tolerance):
+                regressions.append("{} {}: {:.4g} -> {:.4g} (+{:.0%})".format(
+                    key, metric, old, new, new / old - 1))
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-full", type=int, default=100000,
+                        help="largest size for cases buffering full bodies")
+    parser.add_argument("--save", metavar="PATH",
+                        help="write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH",
+                        help="fail if results regress against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.max_full)
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file),
+                                  args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Record/replay HTTP layer for the github org client.
+
+A ``Cassette`` stands in for a ``requests.Session``: pass it as the
+``session`` of ``get_json``, ``iter_json`` or ``GithubOrgClient`` and
+recorded responses are served from memory or from a compact JSON file
+(gzip compressed when the name ends in ``.gz``).
+"""
+import datetime
+import gzip
+import json
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+)
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import parse_header_links
+
+__all__ = [
+    "CannedResponse",
+    "Cassette",
+    "CassetteMiss",
+    "Recorder",
+]
+
+# Headers that describe the wire encoding rather than the replayed body
+_SKIPPED_HEADERS = frozenset((
+    "connection",
+    "content-encoding",
+    "content-length",
+    "keep-alive",
+    "transfer-encoding",
+))
+
+
+class CassetteMiss(LookupError):
+    """No response was recorded for the requested URL"""
+
+
+def _request_url(url: str, params: Mapping = None) -> str:
+    """``url`` with ``params`` encoded the way requests does"""
+    if not params:
+        return url
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+class CannedResponse:
+    """The subset of ``requests.Response`` used by the client"""
+
+    def __init__(
+        self,
+        url: str,
+        body: Any = None,
+        status: int = 200,
+        headers: Mapping[str, str] = None,
+        elapsed: float = 0.0,
+    ) -> None:
+        """Init method of CannedResponse"""
+        self.url = url
+        self.status_code = status
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+        self._body = body
+        self._content: Optional[bytes] = None
+
+    @property
+    def content(self) -> bytes:
+        """Body encoded as JSON bytes"""
+        if self._content is None:
+            self._content = (
+                b"" if self._body is None
+                else json.dumps(self._body).encode("utf-8")
+            )
+        return self._content
+
+    @property
+    def text(self) -> str:
+        """Body as text"""
+        return self.content.decode("utf-8")
+
+    @property
+    def ok(self) -> bool:
+        """True for status codes below 400"""
+        return self.status_code < 400
+
+    @property
+    def links(self) -> Dict[str, Dict[str, str]]:
+        """Parsed ``Link`` header, keyed by rel"""
+        header = self.headers.get("link")
+        if not header:
+            return {}
+        return {
+            link.get("rel") or link.get("url"): link
+            for link in parse_header_links(header)
+        }
+
+    def json(self) -> Any:
+        """Decoded body"""
+        return self._body
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        """Body in ``chunk_size`` byte chunks"""
+        content = self.content
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def raise_for_status(self) -> None:
+        """Raise ``requests.HTTPError`` for error status codes"""
+        if not self.ok:
+            raise requests.HTTPError(
+                "{} Error for url: {}".format(self.status_code, self.url),
+                response=self,
+            )
+
+    def close(self) -> None:
+        """Nothing to release"""
+
+
+class Cassette:
+    """Canned responses keyed by URL, usable as a session.
+
+    Replays sleep ``latency + scale * recorded_elapsed`` seconds per
+    request, so ``scale=1.0`` reproduces recorded response times and
+    the default replays instantly.
+    """
+    VERSION = 1
+
+    def __init__(
+        self,
+        interactions: Mapping[str, Dict] = None,
+        latency: float = 0.0,
+        scale: float = 0.0,
+    ) -> None:
+        """Init method of Cassette"""
+        self.interactions: Dict[str, Dict] = dict(interactions or {})
+        self.latency = latency
+        self.scale = scale
+        self.requests: List[str] = []
+
+    def add(
+        self,
+        url: str,
+        body: Any = None,
+        status: int = 200,
+        headers: Mapping[str, str] = None,
+        elapsed: float = 0.0,
+    ) -> None:
+        """Record a response for ``url``"""
+        interaction: Dict[str, Any] = {"status": status, "body": body}
+        if headers:
+            interaction["headers"] = dict(headers)
+        if elapsed:
+            interaction["elapsed"] = elapsed
+        self.interactions[url] = interaction
+
+    def add_pages(
+        self,
+        url: str,
+        items: List,
+        per_page: int = 30,
+        headers: Mapping[str, str] = None,
+        **kwargs: Any
+    ) -> None:
+        """Record ``items`` as GitHub-style pages linked by ``Link``
+        headers, the first page served at ``url`` itself."""
+        pages = [
+            items[start:start + per_page]
+            for start in range(0, len(items), per_page)
+        ] or [[]]
+        separator = "&" if "?" in url else "?"
+
+        def page_url(number: int) -> str:
+            if number == 1:
+                return url
+            return "{}{}page={}".format(url, separator, number)
+
+        for number, page in enumerate(pages, 1):
+            links = []
+            if number < len(pages):
+                links.append('<{}>; rel="next"'.format(page_url(number + 1)))
+                links.append('<{}>; rel="last"'.format(page_url(len(pages))))
+            if number > 1:
+                links.append('<{}>; rel="first"'.format(page_url(1)))
+                links.append('<{}>; rel="prev"'.format(page_url(number - 1)))
+            page_headers = dict(headers or {})
+            if links:
+                page_headers["Link"] = ", ".join(links)
+            self.add(page_url(number), page, headers=page_headers, **kwargs)
+
+    def get(
+        self, url: str, params: Mapping = None, **kwargs: Any
+    ) -> CannedResponse:
+        """Replay the response recorded for ``url``"""
+        url = _request_url(url, params)
+        try:
+            interaction = self.interactions[url]
+        except KeyError:
+            raise CassetteMiss(url) from None
+        self.requests.append(url)
+        elapsed = interaction.get("elapsed", 0.0)
+        delay = self.latency + self.scale * elapsed
+        if delay > 0:
+            time.sleep(delay)
+        return CannedResponse(
+            url,
+            interaction.get("body"),
+            interaction.get("status", 200),
+            interaction.get("headers"),
+            elapsed,
+        )
+
+    def record(self, session: requests.Session = None) -> "Recorder":
+        """Session that forwards to ``session`` and records responses
+        into this cassette"""
+        return Recorder(self, session)
+
+    @staticmethod
+    def _open(path: str, mode: str):
+        """Open ``path`` as text, through gzip for ``.gz`` names"""
+        if path.endswith(".gz"):
+            return gzip.open(path, mode + "t", encoding="utf-8")
+        return open(path, mode, encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str, **kwargs: Any) -> "Cassette":
+        """Read a cassette file"""
+        with cls._open(path, "r") as cassette_file:
+            data = json.load(cassette_file)
+        if data.get("version") != cls.VERSION:
+            raise ValueError("Unsupported cassette version in {}".format(path))
+        return cls(data["interactions"], **kwargs)
+
+    def save(self, path: str) -> None:
+        """Write the cassette as compact JSON"""
+        data = {"version": self.VERSION, "interactions": self.interactions}
+        with self._open(path, "w") as cassette_file:
+            json.dump(data, cassette_file, separators=(",", ":"))
+
+
+class Recorder:
+    """Session wrapper that records every response into a cassette"""
+
+    def __init__(
+        self, cassette: Cassette, session: requests.Session = None
+    ) -> None:
+        """Init method of Recorder"""
+        self.cassette = cassette
+        self.session = requests.Session() if session is None else session
+
+    def get(
+        self, url: str, params: Mapping = None, **kwargs: Any
+    ) -> CannedResponse:
+        """Perform the request and record its response"""
+        kwargs.pop("stream", None)
+        url = _request_url(url, params)
+        response = self.session.get(url, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in _SKIPPED_HEADERS
+        }
+        elapsed = response.elapsed.total_seconds()
+        self.cassette.add(url, body, response.status_code, headers, elapsed)
+        return CannedResponse(
+            url, body, response.status_code, headers, elapsed
+        )
@@ -1,58 +1,359 @@
 #!/usr/bin/env python3
 """A github org client
 """
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import attrgetter, itemgetter
 from typing import (
-    List,
+    Any,
     Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
 )
 
+import requests
+
+from sync import RepoSync
+from tracing import span
 from utils import (
     get_json,
-    access_nested_map,
-    memoize,
+    iter_json,
+    compile_path,
+    locked_memoize,
 )
 
+_license_key = compile_path(("license", "key"), default=None)
+
+SUMMARY_FIELDS: Dict[str, Sequence[str]] = {
+    "name": ("name",),
+    "license": ("license", "key"),
+    "language": ("language",),
+    "archived": ("archived",),
+}
+
+
+@lru_cache(maxsize=None)
+def _summary_type(name: str, fields: Tuple[Tuple[str, Tuple], ...]) -> type:
+    """Build (once per field set) a compact namedtuple repo record"""
+    accessors = [compile_path(path, default=None) for _, path in fields]
+    intern = sys.intern
+
+    def from_repo(cls, repo: Mapping) -> "RepoSummary":
+        """Project a repo dict into a summary, interning strings"""
+        values = []
+        for accessor in accessors:
+            value = accessor(repo)
+            values.append(intern(value) if type(value) is str else value)
+        return tuple.__new__(cls, values)
+
+    base = namedtuple(name, [field for field, _ in fields])
+    return type(name, (base,), {
+        "__slots__": (),
+        "__doc__": "Compact repo record with fields {}".format(base._fields),
+        "fields": dict(fields),
+        "from_repo": classmethod(from_repo),
+    })
+
+
+def repo_summary_type(
+    fields: Mapping[str, Sequence[str]] = None, name: str = "RepoSummary"
+) -> type:
+    """Namedtuple type holding only ``fields`` of a repo.
+    ``fields`` maps attribute names to key paths in the repo payload and
+    must include ``name``. Use ``from_repo`` to build records.
+    """
+    fields = SUMMARY_FIELDS if fields is None else fields
+    if "name" not in fields:
+        raise ValueError("Summary fields must include 'name'")
+    return _summary_type(name, tuple(
+        (field, tuple(path)) for field, path in fields.items()
+    ))
+
+
+RepoSummary = repo_summary_type()
+
+
+class RepoIndex:
+    """Facet index over a repos payload.
+
+    Maps every facet value (license key, language, archived flag) to
+    the positions of the repos carrying it, so filtered lookups cost
+    O(result) instead of a scan of the whole payload.
+    """
+    FACETS: Dict[str, Sequence[str]] = {
+        "license": ("license", "key"),
+        "language": ("language",),
+        "archived": ("archived",),
+    }
+    _MISSING = object()
+
+    def __init__(self, repos: Sequence[Mapping]) -> None:
+        """Build the index in a single pass over ``repos``, which are
+        repo dicts or repo summaries"""
+        self.source = repos
+        self.names: List[str] = []
+        self.facets: Dict[str, Dict[Any, List[int]]] = {
+            facet: {} for facet in self.FACETS
+        }
+        if not repos:
+            return
+        get_name, getters = self._getters(repos[0])
+        accessors = [
+            (self.facets[facet], getter) for facet, getter in getters.items()
+        ]
+        for position, repo in enumerate(repos):
+            self.names.append(get_name(repo))
+            for index, accessor in accessors:
+                value = accessor(repo)
+                if value is not self._MISSING:
+                    index.setdefault(value, []).append(position)
+
+    def _getters(self, repo: Any) -> Tuple[Any, Dict[str, Any]]:
+        """Name and facet getters suited to the type of ``repo``"""
+        fields = getattr(repo, "_fields", None)
+        if fields is not None:
+            return attrgetter("name"), {
+                facet: attrgetter(facet)
+                for facet in self.FACETS if facet in fields
+            }
+        return itemgetter("name"), {
+            facet: compile_path(path, default=self._MISSING)
+            for facet, path in self.FACETS.items()
+        }
+
+    def positions(self, facet: str, values: Iterable) -> List[int]:
+        """Sorted positions of repos whose ``facet`` is any of ``values``"""
+        index = self.facets[facet]
+        matches = [index.get(value, ()) for value in values]
+        if len(matches) == 1:
+            return list(matches[0])
+        return sorted({pos for positions in matches for pos in positions})
+
+    def select(self, **filters: Any) -> List[str]:
+        """Names of the repos matching every given facet filter.
+
+        A filter value may be a single value or an iterable of values;
+        values of one facet are OR-ed, different facets are AND-ed.
+        ``None`` filters are ignored.
+        """
+        selected = None
+        for facet, values in filters.items():
+            if values is None:
+                continue
+            if isinstance(values, (str, bool)):
+                values = (values,)
+            positions = self.positions(facet, values)
+            if selected is None:
+                selected = positions
+            else:
+                keep = set(positions)
+                selected = [pos for pos in selected if pos in keep]
+        if selected is None:
+            return list(self.names)
+        return [self.names[pos] for pos in selected]
+
+    def group_by(self, facet: str) -> Dict[Any, List[str]]:
+        """Repo names grouped by ``facet`` value; repos without the
+        facet are grouped under ``None``."""
+        groups = {
+            value: list(positions)
+            for value, positions in self.facets[facet].items()
+        }
+        covered = {pos for positions in groups.values() for pos in positions}
+        missing = [
+            pos for pos in range(len(self.names)) if pos not in covered
+        ]
+        if missing:
+            groups[None] = sorted(groups.get(None, []) + missing)
+        return {
+            value: [self.names[pos] for pos in positions]
+            for value, positions in groups.items()
+        }
+
 
 class GithubOrgClient:
     """A Githib org client
     """
     ORG_URL = "https://api.github.com/orgs/{org}"
+    REPO_PATHS = (("name",),) + tuple(RepoIndex.FACETS.values())
 
-    def __init__(self, org_name: str) -> None:
-        """Init method of GithubOrgClient"""
+    def __init__(
+        self,
+        org_name: str,
+        stream: bool = False,
+        session: requests.Session = None,
+        summary_type: type = None,
+        sync: RepoSync = None,
+    ) -> None:
+        """Init method of GithubOrgClient.
+        With ``stream`` the repos payload is parsed incrementally and
+        each repo is projected to ``REPO_PATHS``. ``session`` is used
+        for all requests when given. With ``summary_type`` (for example
+        ``RepoSummary``) repos are kept as compact records instead of
+        the full GitHub JSON. With ``sync`` the repos payload is
+        fetched incrementally against the sync's persisted state.
+        """
         self._org_name = org_name
+        self._stream = stream
+        self._summary_type = summary_type
+        self._sync = sync
+        self._request_kwargs = {} if session is None else {"session": session}
+        self._repos_index = None
 
-    @memoize
+    @locked_memoize
     def org(self) -> Dict:
         """Memoize org"""
-        return get_json(self.ORG_URL.format(org=self._org_name))
+        with span("GithubOrgClient.org", org=self._org_name):
+            return get_json(
+                self.ORG_URL.format(org=self._org_name),
+                **self._request_kwargs
+            )
 
     @property
     def _public_repos_url(self) -> str:
         """Public repos URL"""
         return self.org["repos_url"]
 
-    @memoize
-    def repos_payload(self) -> Dict:
+    @locked_memoize
+    def repos_payload(self) -> List[Dict]:
         """Memoize repos payload"""
-        return get_json(self._public_repos_url)
-
-    def public_repos(self, license: str = None) -> List[str]:
-        """Public repos"""
-        json_payload = self.repos_payload
-        public_repos = [
-            repo["name"] for repo in json_payload
-            if license is None or self.has_license(repo, license)
-        ]
+        with span(
+            "GithubOrgClient.repos_payload", org=self._org_name
+        ) as trace:
+            repos = self._load_repos()
+            trace.set("repos", len(repos))
+        return repos
+
+    def _load_repos(self) -> List:
+        """Fetch the repos as configured: synced, streamed or buffered,
+        optionally as summaries"""
+        summary_type = self._summary_type
+        if self._sync is not None:
+            repos = self._sync.sync(self._org_name, self._public_repos_url)
+        elif self._stream:
+            paths = (
+                self.REPO_PATHS if summary_type is None
+                else summary_type.fields.values()
+            )
+            repos = iter_json(
+                self._public_repos_url, paths, **self._request_kwargs
+            )
+            if summary_type is None:
+                repos = list(repos)
+        else:
+            repos = get_json(self._public_repos_url, **self._request_kwargs)
+        if summary_type is not None:
+            return [summary_type.from_repo(repo) for repo in repos]
+        return repos
+
+    @property
+    def repos_index(self) -> RepoIndex:
+        """Facet index of the repos payload, rebuilt when the payload
+        is invalidated"""
+        payload = self.repos_payload
+        index = self._repos_index
+        if index is None or index.source is not payload:
+            with span("GithubOrgClient.repos_index", org=self._org_name):
+                index = self._repos_index = RepoIndex(payload)
+        return index
 
-        return public_repos
+    def public_repos(
+        self,
+        license: Union[str, Iterable[str]] = None,
+        language: Union[str, Iterable[str]] = None,
+        archived: bool = None,
+    ) -> List[str]:
+        """Public repos, optionally filtered by license, language or
+        archived flag. Several licenses or languages may be given."""
+        with span("GithubOrgClient.public_repos", org=self._org_name):
+            index = self.repos_index
+            with span("GithubOrgClient.select") as trace:
+                names = index.select(
+                    license=license,
+                    language=language,
+                    archived=archived,
+                )
+                trace.set("results", len(names))
+        return names
 
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
         """Static: has_license"""
         assert license_key is not None, "license_key cannot be None"
+        return _license_key(repo) == license_key
+
+
+class OrgResult(NamedTuple):
+    """Outcome of one organization in a batch"""
+    org: str
+    repos_by_license: Dict[Optional[str], List[str]]
+    latency: float
+    error: Optional[Exception] = None
+
+
+class GithubOrgBatchClient:
+    """Fetch many github orgs concurrently.
+
+    Org names are deduplicated, requests share one pooled session, and
+    the per-org ``GithubOrgClient`` instances are kept so repeated runs
+    are served from their memoized payloads.
+    """
+
+    def __init__(
+        self,
+        org_names: Iterable[str],
+        max_workers: int = 8,
+        session: requests.Session = None,
+        stream: bool = False,
+        summary_type: type = None,
+    ) -> None:
+        """Init method of GithubOrgBatchClient"""
+        self.org_names = list(dict.fromkeys(org_names))
+        self.max_workers = max_workers
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=max_workers, pool_maxsize=max_workers
+            )
+            session.mount("https://", adapter)
+        self._session = session
+        self._stream = stream
+        self._summary_type = summary_type
+        self._clients: Dict[str, GithubOrgClient] = {}
+
+    def client(self, org_name: str) -> GithubOrgClient:
+        """Shared client for ``org_name``"""
+        client = self._clients.get(org_name)
+        if client is None:
+            client = self._clients.setdefault(org_name, GithubOrgClient(
+                org_name, stream=self._stream, session=self._session,
+                summary_type=self._summary_type,
+            ))
+        return client
+
+    def _fetch(self, org_name: str) -> OrgResult:
+        """Fetch one org, capturing its latency and any failure"""
+        start = time.perf_counter()
         try:
-            has_license = access_nested_map(repo, ("license", "key")) == license_key
-        except KeyError:
-            return False
-        return has_license
\ No newline at end of file
+            by_license = self.client(org_name).repos_index.group_by("license")
+        except Exception as error:
+            return OrgResult(
+                org_name, {}, time.perf_counter() - start, error
+            )
+        return OrgResult(org_name, by_license, time.perf_counter() - start)
+
+    def run(self) -> Dict[str, OrgResult]:
+        """Fetch every org; failures are reported, not raised"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(
+                self.org_names, pool.map(self._fetch, self.org_names)
+            ))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Incremental repo sync for github orgs polled repeatedly.
+
+``RepoSync`` asks GitHub for the repos of an org sorted by most recent
+update and stops paging at the first repo older than the cursor saved
+by the previous sync. The first page is requested conditionally with
+the saved ETag, so an unchanged org costs a single ``304`` response.
+Cursors, ETags and the merged repo list persist in a ``RepoSyncStore``.
+
+Deleted repos are only noticed by a full sync (``full=True``).
+"""
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+
+__all__ = [
+    "RepoSync",
+    "RepoSyncStore",
+]
+
+
+class RepoSyncStore:
+    """Sync state per org, persisted as a JSON file"""
+
+    def __init__(self, path: str = None) -> None:
+        """Init method of RepoSyncStore; ``path=None`` keeps state in
+        memory only"""
+        self.path = path
+        self._lock = threading.Lock()
+        self._orgs: Dict[str, Dict] = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as store_file:
+                self._orgs = json.load(store_file)
+
+    def get(self, org: str) -> Optional[Dict]:
+        """Saved ``{"etag", "cursor", "repos"}`` state of ``org``"""
+        return self._orgs.get(org)
+
+    def put(self, org: str, state: Dict) -> None:
+        """Replace the state of ``org`` and persist the store"""
+        with self._lock:
+            self._orgs[org] = state
+            self._save()
+
+    def _save(self) -> None:
+        """Atomically rewrite the store file"""
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                json.dump(self._orgs, tmp_file, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class RepoSync:
+    """Fetch only the repos that changed since the last sync"""
+    REPOS_URL = "https://api.github.com/orgs/{org}/repos"
+
+    def __init__(
+        self,
+        store: RepoSyncStore = None,
+        session: requests.Session = None,
+        per_page: int = 100,
+    ) -> None:
+        """Init method of RepoSync"""
+        self.store = RepoSyncStore() if store is None else store
+        self.session = requests if session is None else session
+        self.per_page = per_page
+
+    def _get(self, url: str, **kwargs: Any) -> requests.Response:
+        """GET ``url``, raising for errors other than ``304``"""
+        response = self.session.get(url, **kwargs)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def sync(
+        self, org: str, url: str = None, full: bool = False
+    ) -> List[Dict]:
+        """Bring the saved repos of ``org`` up to date and return them,
+        most recently updated first"""
+        state = None if full else self.store.get(org)
+        url = self.REPOS_URL.format(org=org) if url is None else url
+        headers = {}
+        if state is not None and state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        response = self._get(url, headers=headers, params={
+            "sort": "updated",
+            "direction": "desc",
+            "per_page": self.per_page,
+        })
+        if response.status_code == 304:
+            return state["repos"]
+
+        etag = response.headers.get("ETag")
+        cursor = None if state is None else state["cursor"]
+        changed = []
+        while True:
+            page = response.json()
+            fresh = [
+                repo for repo in page
+                if cursor is None or repo["updated_at"] >= cursor
+            ]
+            changed.extend(fresh)
+            next_url = response.links.get("next", {}).get("url")
+            if len(fresh) < len(page) or not next_url:
+                break
+            response = self._get(next_url)
+
+        repos = changed
+        if state is not None:
+            changed_ids = {repo["id"] for repo in changed}
+            repos = changed + [
+                repo for repo in state["repos"]
+                if repo["id"] not in changed_ids
+            ]
+        if changed:
+            cursor = max(
+                [repo["updated_at"] for repo in changed] + [cursor or ""]
+            )
+        self.store.put(org, {"etag": etag, "cursor": cursor, "repos": repos})
+        return repos
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the cassette module
+"""
+
+import os
+import tempfile
+import unittest
+from parameterized import parameterized
+from unittest.mock import patch, Mock
+
+from cassette import Cassette, CassetteMiss
+from utils import get_json, iter_json
+
+URL = "https://api.github.com/orgs/testorg/repos"
+
+
+class TestCassette(unittest.TestCase):
+    """Test cases for the Cassette replay session"""
+
+    def test_replay(self):
+        """Test get_json and iter_json replay recorded bodies"""
+        cassette = Cassette()
+        cassette.add(URL, [{"name": "repo1"}, {"name": "repo2"}],
+                     headers={"ETag": '"abc"'})
+
+        self.assertEqual(get_json(URL, session=cassette),
+                         [{"name": "repo1"}, {"name": "repo2"}])
+        self.assertEqual(list(iter_json(URL, session=cassette)),
+                         [{"name": "repo1"}, {"name": "repo2"}])
+        self.assertEqual(cassette.get(URL).headers["etag"], '"abc"')
+        self.assertEqual(cassette.requests, [URL, URL, URL])
+
+    def test_miss(self):
+        """Test unrecorded URLs raise CassetteMiss"""
+        with self.assertRaises(CassetteMiss):
+            Cassette().get(URL)
+
+    def test_params(self):
+        """Test query parameters are part of the recorded URL"""
+        cassette = Cassette()
+        cassette.add(URL + "?page=2&per_page=10", [])
+        response = cassette.get(URL, params={"page": 2, "per_page": 10})
+        self.assertEqual(response.json(), [])
+
+    def test_add_pages(self):
+        """Test pages are linked like GitHub paginated responses"""
+        cassette = Cassette()
+        cassette.add_pages(URL, list(range(5)), per_page=2)
+
+        items, url = [], URL
+        while url:
+            response = cassette.get(url)
+            items.extend(response.json())
+            url = response.links.get("next", {}).get("url")
+
+        self.assertEqual(items, [0, 1, 2, 3, 4])
+        self.assertEqual(cassette.get(URL).links["last"]["url"],
+                         URL + "?page=3")
+
+    @parameterized.expand([
+        (0.0, 0.0, None),
+        (0.01, 0.0, 0.01),
+        (0.0, 1.0, 0.25),
+        (0.01, 2.0, 0.51),
+    ])
+    @patch('cassette.time.sleep')
+    def test_latency(self, latency, scale, expected, mock_sleep):
+        """Test replay sleeps latency plus the scaled recorded time"""
+        cassette = Cassette(latency=latency, scale=scale)
+        cassette.add(URL, [], elapsed=0.25)
+        cassette.get(URL)
+        if expected is None:
+            mock_sleep.assert_not_called()
+        else:
+            self.assertAlmostEqual(mock_sleep.call_args[0][0], expected)
+
+    @parameterized.expand([("cassette.json",), ("cassette.json.gz",)])
+    def test_save_load(self, name):
+        """Test cassettes round-trip through plain and gzip files"""
+        cassette = Cassette()
+        cassette.add_pages(URL, [{"name": "répo"}] * 3, per_page=2,
+                           elapsed=0.1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, name)
+            cassette.save(path)
+            loaded = Cassette.load(path)
+        self.assertEqual(loaded.interactions, cassette.interactions)
+
+    def test_record(self):
+        """Test the recorder stores responses for later replay"""
+        response = Mock(status_code=200, headers={
+            "ETag": '"abc"', "Content-Encoding": "gzip"
+        })
+        response.json.return_value = {"repos_url": URL}
+        response.elapsed.total_seconds.return_value = 0.2
+        session = Mock()
+        session.get.return_value = response
+        cassette = Cassette()
+
+        recorded = cassette.record(session).get(URL)
+
+        session.get.assert_called_once_with(URL)
+        self.assertEqual(recorded.json(), {"repos_url": URL})
+        self.assertEqual(cassette.interactions[URL], {
+            "status": 200,
+            "body": {"repos_url": URL},
+            "headers": {"ETag": '"abc"'},
+            "elapsed": 0.2,
+        })
@@ -3,12 +3,23 @@
 Unit tests for the client module
 """
 
+import os
 import unittest
 from parameterized import parameterized, parameterized_class
 from unittest.mock import patch, PropertyMock, Mock
 
-from client import GithubOrgClient
-from fixtures import TEST_PAYLOAD
+from cassette import Cassette
+from client import (
+    GithubOrgBatchClient,
+    GithubOrgClient,
+    RepoIndex,
+    RepoSummary,
+    repo_summary_type,
+)
+from fixtures import TEST_PAYLOAD, synthetic_payload
+
+CASSETTES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "cassettes")
 
 
 class TestGithubOrgClient(unittest.TestCase):
@@ -93,6 +104,84 @@ class TestGithubOrgClient(unittest.TestCase):
             expected_repos = ["repo2"]
             self.assertEqual(result, expected_repos)
 
+    @parameterized.expand([
+        ({"license": ["mit", "gpl"]}, ["repo1", "repo3"]),
+        ({"language": "Python"}, ["repo1", "repo4"]),
+        ({"license": "mit", "language": "Python"}, ["repo1"]),
+        ({"archived": True}, ["repo3"]),
+        ({"license": "bsd"}, []),
+    ])
+    @patch('client.get_json')
+    def test_public_repos_with_facets(self, filters, expected, mock_get_json):
+        """Test public_repos combines license, language and archived"""
+        mock_get_json.return_value = [
+            {"name": "repo1", "license": {"key": "mit"},
+             "language": "Python", "archived": False},
+            {"name": "repo2", "license": {"key": "apache-2.0"},
+             "language": "Go", "archived": False},
+            {"name": "repo3", "license": {"key": "gpl"},
+             "language": "C", "archived": True},
+            {"name": "repo4", "license": None, "language": "Python"},
+        ]
+
+        with patch('client.GithubOrgClient._public_repos_url',
+                   new_callable=PropertyMock):
+            client = GithubOrgClient("testorg")
+            self.assertEqual(client.public_repos(**filters), expected)
+
+    @patch('client.get_json')
+    def test_repos_index_built_once(self, mock_get_json):
+        """Test repeated filtered queries reuse the repos index"""
+        mock_get_json.return_value = [
+            {"name": "repo1", "license": {"key": "mit"}},
+            {"name": "repo2", "license": {"key": "apache-2.0"}},
+        ]
+
+        with patch('client.GithubOrgClient._public_repos_url',
+                   new_callable=PropertyMock), \
+                patch('client.RepoIndex', wraps=RepoIndex) as mock_index:
+            client = GithubOrgClient("testorg")
+            self.assertEqual(client.public_repos(license="mit"), ["repo1"])
+            self.assertEqual(client.public_repos(license="apache-2.0"),
+                             ["repo2"])
+            self.assertEqual(client.public_repos(), ["repo1", "repo2"])
+            mock_index.assert_called_once()
+
+    @patch('client.get_json')
+    def test_repos_payload_invalidate(self, mock_get_json):
+        """Test invalidating repos_payload refetches and reindexes"""
+        mock_get_json.side_effect = [
+            [{"name": "repo1", "license": {"key": "mit"}}],
+            [{"name": "repo2", "license": {"key": "mit"}}],
+        ]
+
+        with patch('client.GithubOrgClient._public_repos_url',
+                   new_callable=PropertyMock):
+            client = GithubOrgClient("testorg")
+            self.assertEqual(client.public_repos(license="mit"), ["repo1"])
+            del client.repos_payload
+            self.assertEqual(client.public_repos(license="mit"), ["repo2"])
+            self.assertEqual(mock_get_json.call_count, 2)
+
+    @patch('client.iter_json')
+    def test_public_repos_stream(self, mock_iter_json):
+        """Test stream mode fetches projected repos incrementally"""
+        mock_iter_json.return_value = iter([
+            {"name": "repo1", "license": {"key": "mit"}},
+            {"name": "repo2"},
+        ])
+
+        with patch('client.GithubOrgClient._public_repos_url',
+                   new_callable=PropertyMock) as mock_repos_url:
+            mock_repos_url.return_value = "https://example.com/repos"
+            client = GithubOrgClient("testorg", stream=True)
+
+            self.assertEqual(client.public_repos(), ["repo1", "repo2"])
+            self.assertEqual(client.public_repos(license="mit"), ["repo1"])
+            mock_iter_json.assert_called_once_with(
+                "https://example.com/repos", GithubOrgClient.REPO_PATHS
+            )
+
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
         ({"license": {"key": "other_license"}}, "my_license", False),
@@ -105,6 +194,99 @@ class TestGithubOrgClient(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class TestRepoSummary(unittest.TestCase):
+    """Test cases for compact repo summaries"""
+
+    def test_from_repo(self):
+        """Test repos are projected and missing paths become None"""
+        summary = RepoSummary.from_repo(
+            {"name": "repo1", "license": None, "owner": {"login": "x"}}
+        )
+        self.assertEqual(summary, ("repo1", None, None, None))
+        self.assertEqual(summary.name, "repo1")
+        self.assertFalse(hasattr(summary, "__dict__"))
+
+    def test_custom_fields(self):
+        """Test custom field sets build cached summary types"""
+        fields = {"name": ("name",), "owner": ("owner", "login")}
+        summary_type = repo_summary_type(fields)
+
+        self.assertIs(summary_type, repo_summary_type(dict(fields)))
+        self.assertEqual(
+            summary_type.from_repo({"name": "a", "owner": {"login": "x"}}),
+            ("a", "x"),
+        )
+        with self.assertRaises(ValueError):
+            repo_summary_type({"owner": ("owner", "login")})
+
+    def test_strings_interned(self):
+        """Test string values are interned across summaries"""
+        first, second = (
+            RepoSummary.from_repo({"name": "a", "language": "".join(lang)})
+            for lang in (["Py", "thon"], ["Pyt", "hon"])
+        )
+        self.assertIs(first.language, second.language)
+
+
+class TestGithubOrgBatchClient(unittest.TestCase):
+    """Test cases for the GithubOrgBatchClient class"""
+
+    PAYLOADS = {
+        "https://api.github.com/orgs/a": {"repos_url": "a/repos"},
+        "https://api.github.com/orgs/b": {"repos_url": "b/repos"},
+        "https://api.github.com/orgs/broken": {"message": "Not Found"},
+        "a/repos": [
+            {"name": "a1", "license": {"key": "mit"}},
+            {"name": "a2", "license": None},
+            {"name": "a3", "license": {"key": "mit"}},
+        ],
+        "b/repos": [{"name": "b1", "license": {"key": "apache-2.0"}}],
+    }
+
+    def setUp(self):
+        """Session whose responses come from PAYLOADS"""
+        self.session = Mock()
+        self.session.get.side_effect = lambda url: Mock(**{
+            "json.return_value": self.PAYLOADS[url]
+        })
+
+    def test_run(self):
+        """Test orgs are deduplicated and grouped by license"""
+        batch = GithubOrgBatchClient(["a", "b", "a"], session=self.session)
+        results = batch.run()
+
+        self.assertEqual(list(results), ["a", "b"])
+        self.assertEqual(results["a"].repos_by_license,
+                         {"mit": ["a1", "a3"], None: ["a2"]})
+        self.assertEqual(results["b"].repos_by_license,
+                         {"apache-2.0": ["b1"]})
+        self.assertIsNone(results["a"].error)
+        self.assertGreaterEqual(results["a"].latency, 0)
+        self.assertEqual(self.session.get.call_count, 4)
+
+    def test_run_failures(self):
+        """Test a failing org is reported without aborting the batch"""
+        batch = GithubOrgBatchClient(["broken", "b"], session=self.session)
+        results = batch.run()
+
+        self.assertIsInstance(results["broken"].error, KeyError)
+        self.assertEqual(results["broken"].repos_by_license, {})
+        self.assertEqual(results["b"].repos_by_license,
+                         {"apache-2.0": ["b1"]})
+
+    def test_run_reuses_clients(self):
+        """Test repeated runs are served from the shared client cache"""
+        batch = GithubOrgBatchClient(["a", "b"], session=self.session)
+        first = batch.run()
+        second = batch.run()
+
+        self.assertEqual(
+            {org: r.repos_by_license for org, r in first.items()},
+            {org: r.repos_by_license for org, r in second.items()},
+        )
+        self.assertEqual(self.session.get.call_count, 4)
+
+
 @parameterized_class([
     {
         'org_payload': TEST_PAYLOAD[0][0],
@@ -153,3 +335,60 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
         client = GithubOrgClient("google")
         repos = client.public_repos(license="apache-2.0")
         self.assertEqual(repos, self.apache2_repos)
+
+
+class TestReplayGithubOrgClient(unittest.TestCase):
+    """Integration tests for GithubOrgClient replayed from a cassette"""
+
+    def setUp(self):
+        """Load the recorded google org responses"""
+        self.cassette = Cassette.load(
+            os.path.join(CASSETTES, "google.json.gz")
+        )
+
+    @parameterized.expand([(False,), (True,)])
+    def test_public_repos(self, stream):
+        """Test public_repos against recorded responses"""
+        client = GithubOrgClient("google", stream=stream,
+                                 session=self.cassette)
+        self.assertEqual(client.public_repos(), TEST_PAYLOAD[0][2])
+        self.assertEqual(client.public_repos(license="apache-2.0"),
+                         TEST_PAYLOAD[0][3])
+        self.assertEqual(self.cassette.requests, [
+            "https://api.github.com/orgs/google",
+            "https://api.github.com/orgs/google/repos",
+        ])
+
+    @parameterized.expand([(False,), (True,)])
+    def test_public_repos_synthetic(self, stream):
+        """Test public_repos on a large synthetic org"""
+        org, repos, expected_repos, apache2_repos = synthetic_payload(2000)
+        cassette = Cassette()
+        cassette.add("https://api.github.com/orgs/google", org)
+        cassette.add(org["repos_url"], repos)
+
+        client = GithubOrgClient("google", stream=stream, session=cassette)
+        self.assertEqual(client.public_repos(), expected_repos)
+        self.assertEqual(client.public_repos(license="apache-2.0"),
+                         apache2_repos)
+
+    @parameterized.expand([(False,), (True,)])
+    def test_public_repos_summary(self, stream):
+        """Test public_repos on repos kept as compact summaries"""
+        client = GithubOrgClient("google", stream=stream,
+                                 session=self.cassette,
+                                 summary_type=RepoSummary)
+        self.assertEqual(client.public_repos(), TEST_PAYLOAD[0][2])
+        self.assertEqual(client.public_repos(license="apache-2.0"),
+                         TEST_PAYLOAD[0][3])
+        self.assertEqual(client.repos_payload[2], RepoSummary(
+            "dagger", "apache-2.0", "Java", False
+        ))
+
+    @patch('cassette.time.sleep')
+    def test_recorded_latency(self, mock_sleep):
+        """Test replay can reproduce recorded response times"""
+        self.cassette.scale = 1.0
+        GithubOrgClient("google", session=self.cassette).public_repos()
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list],
+                         [0.12, 0.35])
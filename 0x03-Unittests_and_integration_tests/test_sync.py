@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the sync module
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, PropertyMock
+
+from cassette import CannedResponse, Cassette
+from client import GithubOrgClient
+from sync import RepoSync, RepoSyncStore
+
+URL = "https://api.github.com/orgs/testorg/repos"
+
+
+class FakeGithubServer:
+    """Serve an org's repos sorted by update time, paginated with Link
+    headers and answering 304 to a matching If-None-Match"""
+
+    def __init__(self, count):
+        """Init method of FakeGithubServer with ``count`` repos"""
+        self.clock = datetime.datetime(2024, 1, 1)
+        self.repos = {}
+        self.requests = []
+        for number in range(count):
+            self.add("repo{}".format(number))
+
+    def tick(self):
+        """Next update timestamp"""
+        self.clock += datetime.timedelta(minutes=1)
+        return self.clock.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def add(self, name):
+        """Create a repo"""
+        repo_id = len(self.repos) + 1
+        self.repos[repo_id] = {
+            "id": repo_id, "name": name, "updated_at": self.tick()
+        }
+
+    def update(self, repo_id, **changes):
+        """Change a repo, bumping its update time"""
+        self.repos[repo_id] = dict(
+            self.repos[repo_id], updated_at=self.tick(), **changes
+        )
+
+    def get(self, url, params=None, headers=None):
+        """Session-like entry point"""
+        self.requests.append(url)
+        params = params or {}
+        ordered = sorted(self.repos.values(),
+                         key=lambda repo: repo["updated_at"], reverse=True)
+        etag = '"{}"'.format(
+            hashlib.sha1(json.dumps(ordered).encode()).hexdigest()
+        )
+        if (headers or {}).get("If-None-Match") == etag:
+            return CannedResponse(url, status=304, headers={"ETag": etag})
+        pages = Cassette()
+        pages.add_pages(URL, ordered, per_page=params.get("per_page", 2),
+                        headers={"ETag": etag})
+        return pages.get(url)
+
+
+class TestRepoSync(unittest.TestCase):
+    """Test cases for incremental repo sync"""
+
+    def setUp(self):
+        """Fake org with five repos, two per page"""
+        self.server = FakeGithubServer(5)
+        self.sync = RepoSync(session=self.server, per_page=2)
+
+    def names(self, repos):
+        """Names of ``repos`` in order"""
+        return [repo["name"] for repo in repos]
+
+    def test_first_sync(self):
+        """Test the first sync pages through every repo"""
+        repos = self.sync.sync("testorg", URL)
+
+        self.assertEqual(self.names(repos),
+                         ["repo4", "repo3", "repo2", "repo1", "repo0"])
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.sync.store.get("testorg")["cursor"],
+                         "2024-01-01T00:05:00Z")
+
+    def test_unchanged(self):
+        """Test an unchanged org costs one conditional request"""
+        first = self.sync.sync("testorg", URL)
+        self.server.requests.clear()
+
+        self.assertEqual(self.sync.sync("testorg", URL), first)
+        self.assertEqual(self.server.requests, [URL])
+
+    def test_changes(self):
+        """Test only changed repos are fetched and merged"""
+        self.sync.sync("testorg", URL)
+        self.server.update(1, description="updated")
+        self.server.add("repo5")
+        self.server.requests.clear()
+
+        repos = self.sync.sync("testorg", URL)
+
+        self.assertEqual(self.names(repos),
+                         ["repo5", "repo0", "repo4", "repo3", "repo2",
+                          "repo1"])
+        self.assertEqual(repos[1]["description"], "updated")
+        self.assertEqual(self.server.requests, [URL, URL + "?page=2"])
+
+    def test_full(self):
+        """Test a full sync drops repos deleted on the server"""
+        self.sync.sync("testorg", URL)
+        del self.server.repos[3]
+
+        self.assertEqual(len(self.sync.sync("testorg", URL)), 5)
+        self.assertEqual(len(self.sync.sync("testorg", URL, full=True)), 4)
+
+    def test_persistence(self):
+        """Test state survives a new store on the same file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sync.json")
+            RepoSync(RepoSyncStore(path), self.server, 2).sync("testorg", URL)
+            self.server.requests.clear()
+
+            sync = RepoSync(RepoSyncStore(path), self.server, 2)
+            self.assertEqual(len(sync.sync("testorg", URL)), 5)
+            self.assertEqual(self.server.requests, [URL])
+            self.assertEqual(os.listdir(directory), ["sync.json"])
+
+    def test_client(self):
+        """Test GithubOrgClient fetches repos through the sync"""
+        with patch('client.GithubOrgClient._public_repos_url',
+                   new_callable=PropertyMock) as mock_repos_url:
+            mock_repos_url.return_value = URL
+            client = GithubOrgClient("testorg", sync=self.sync)
+            self.assertEqual(len(client.public_repos()), 5)
+
+            self.server.add("repo5")
+            del client.repos_payload
+            self.assertEqual(client.public_repos()[0], "repo5")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the tracing module
+"""
+
+import os
+import unittest
+from unittest.mock import Mock
+
+from cassette import Cassette
+from client import GithubOrgClient
+from tracing import (
+    InMemoryExporter,
+    LoggingExporter,
+    add_exporter,
+    remove_exporter,
+    span,
+)
+from utils import get_json, iter_json
+
+CASSETTE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "cassettes", "google.json.gz")
+ORG_URL = "https://api.github.com/orgs/google"
+REPOS_URL = "https://api.github.com/orgs/google/repos"
+
+
+class TestSpan(unittest.TestCase):
+    """Test cases for spans and exporters"""
+
+    def setUp(self):
+        """Collect spans for the duration of a test"""
+        self.collector = InMemoryExporter()
+        add_exporter(self.collector)
+        self.addCleanup(remove_exporter, self.collector)
+
+    def test_nesting(self):
+        """Test spans record parents, attributes and durations"""
+        with span("outer", a=1):
+            with span("inner") as inner:
+                inner.set("b", 2)
+
+        inner, outer = self.collector.spans
+        self.assertEqual((inner.name, inner.parent, inner.attributes),
+                         ("inner", "outer", {"b": 2}))
+        self.assertEqual((outer.name, outer.parent, outer.attributes),
+                         ("outer", None, {"a": 1}))
+        self.assertGreaterEqual(outer.duration, inner.duration)
+
+    def test_error(self):
+        """Test a failing block is exported with its error"""
+        with self.assertRaises(KeyError):
+            with span("failing"):
+                raise KeyError("x")
+        self.assertEqual(self.collector.spans[0].attributes,
+                         {"error": "KeyError"})
+
+    def test_disabled(self):
+        """Test nothing is recorded without exporters"""
+        remove_exporter(self.collector)
+        with span("ignored") as trace:
+            trace.set("a", 1)
+        self.assertFalse(trace.recording)
+        add_exporter(self.collector)
+        self.assertEqual(self.collector.spans, [])
+
+    def test_logging_exporter(self):
+        """Test the logging exporter logs name and attributes"""
+        logger = Mock()
+        exporter = LoggingExporter(logger)
+        add_exporter(exporter)
+        self.addCleanup(remove_exporter, exporter)
+
+        with span("logged", a=1):
+            pass
+
+        args = logger.log.call_args[0]
+        self.assertEqual((args[2], args[4]), ("logged", {"a": 1}))
+
+
+class TestTracedClient(unittest.TestCase):
+    """Test cases for spans emitted by get_json and GithubOrgClient"""
+
+    def setUp(self):
+        """Collect spans and replay the google org"""
+        self.collector = InMemoryExporter()
+        add_exporter(self.collector)
+        self.addCleanup(remove_exporter, self.collector)
+        self.cassette = Cassette.load(CASSETTE)
+
+    def test_get_json(self):
+        """Test get_json records request and decode phases"""
+        get_json(REPOS_URL, session=self.cassette)
+
+        self.assertEqual(self.collector.names(), [
+            "get_json.request", "get_json.decode", "get_json",
+        ])
+        request, = self.collector.find("get_json.request")
+        self.assertEqual(request.attributes["status"], 200)
+        self.assertEqual(request.attributes["elapsed"], 0.35)
+        self.assertGreater(request.attributes["bytes"], 1000)
+        decode, = self.collector.find("get_json.decode")
+        self.assertEqual(decode.attributes, {"items": 9})
+
+    def test_iter_json(self):
+        """Test iter_json records items and streamed bytes"""
+        list(iter_json(REPOS_URL, session=self.cassette, chunk_size=512))
+
+        trace, = self.collector.spans
+        self.assertEqual(trace.name, "iter_json")
+        self.assertEqual(trace.attributes["items"], 9)
+        self.assertEqual(trace.attributes["bytes"],
+                         len(self.cassette.get(REPOS_URL).content))
+
+    def test_public_repos(self):
+        """Test client methods form a span tree"""
+        client = GithubOrgClient("google", session=self.cassette)
+        client.public_repos(license="apache-2.0")
+
+        parents = {s.name: s.parent for s in self.collector.spans}
+        self.assertEqual(parents["GithubOrgClient.org"],
+                         "GithubOrgClient.repos_payload")
+        self.assertEqual(parents["GithubOrgClient.repos_payload"],
+                         "GithubOrgClient.public_repos")
+        self.assertEqual(parents["GithubOrgClient.repos_index"],
+                         "GithubOrgClient.public_repos")
+        self.assertEqual(parents["GithubOrgClient.select"],
+                         "GithubOrgClient.public_repos")
+        select, = self.collector.find("GithubOrgClient.select")
+        self.assertEqual(select.attributes, {"results": 4})
+        payload, = self.collector.find("GithubOrgClient.repos_payload")
+        self.assertEqual(payload.attributes, {"org": "google", "repos": 9})
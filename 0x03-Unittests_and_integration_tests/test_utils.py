@@ -3,11 +3,26 @@
 Unit tests for the utils module
 """
 
+import json
+import threading
+import time
 import unittest
 from parameterized import parameterized
 from unittest.mock import patch, Mock
 
-from utils import access_nested_map, get_json, memoize
+from collections import OrderedDict
+
+from utils import (
+    access_nested_map,
+    access_nested_maps,
+    compile_path,
+    get_json,
+    invalidate,
+    iter_json,
+    locked_memoize,
+    memoize,
+    project,
+)
 
 
 class TestAccessNestedMap(unittest.TestCase):
@@ -33,6 +48,53 @@ class TestAccessNestedMap(unittest.TestCase):
         self.assertEqual(f"'{expected_key}'", str(context.exception))
 
 
+class TestCompilePath(unittest.TestCase):
+    """Test cases for the compile_path accessor factory"""
+
+    @parameterized.expand([
+        ({"a": 1}, ("a",), 1),
+        ({"a": {"b": 2}}, ("a",), {"b": 2}),
+        ({"a": {"b": 2}}, ("a", "b"), 2),
+        ({"a": {"b": {"c": 3}}}, ("a", "b", "c"), 3),
+        (OrderedDict(a=OrderedDict(b=2)), ("a", "b"), 2),
+    ])
+    def test_compile_path(self, nested_map, path, expected):
+        """Test compiled accessors match access_nested_map"""
+        self.assertEqual(compile_path(path)(nested_map), expected)
+        self.assertEqual(access_nested_map(nested_map, path), expected)
+
+    @parameterized.expand([
+        ({}, ("a",), 'a'),
+        ({"a": 1}, ("a", "b"), 'b'),
+        ({"a": None}, ("a", "b"), 'b'),
+        ({"a": {"b": [1]}}, ("a", "b", 0), 0),
+    ])
+    def test_compile_path_exception(self, nested_map, path, expected_key):
+        """Test compiled accessors raise the same KeyError"""
+        with self.assertRaises(KeyError) as context:
+            compile_path(path)(nested_map)
+        self.assertEqual(context.exception.args, (expected_key,))
+
+    @parameterized.expand([
+        ({}, ("a",)),
+        ({"a": None}, ("a", "b")),
+        ({"a": {"b": {}}}, ("a", "b", "c")),
+    ])
+    def test_compile_path_default(self, nested_map, path):
+        """Test compiled accessors return the default on missing keys"""
+        self.assertEqual(compile_path(path, default="x")(nested_map), "x")
+
+    def test_access_nested_maps(self):
+        """Test batch extraction of one path from many maps"""
+        maps = [{"license": {"key": "mit"}}, {"license": None}, {}]
+        self.assertEqual(
+            access_nested_maps(maps, ("license", "key"), default=None),
+            ["mit", None, None],
+        )
+        with self.assertRaises(KeyError):
+            access_nested_maps(maps, ("license", "key"))
+
+
 class TestGetJson(unittest.TestCase):
     """Test cases for the get_json function"""
 
@@ -53,6 +115,71 @@ class TestGetJson(unittest.TestCase):
         self.assertEqual(result, test_payload)
 
 
+class TestIterJson(unittest.TestCase):
+    """Test cases for the streaming iter_json function"""
+
+    PAYLOAD = [
+        {"name": "r\u00e9po", "license": {"key": "mit", "url": "u"}},
+        {"name": "other", "license": None, "size": 12345},
+        [1.5, True, None],
+        678,
+        -3.25e-07,
+    ]
+
+    def mock_response(self, chunk_size):
+        """Mock response streaming PAYLOAD in chunks of chunk_size"""
+        body = json.dumps(self.PAYLOAD, ensure_ascii=False).encode()
+        mock_response = Mock()
+        mock_response.iter_content.return_value = [
+            body[i:i + chunk_size] for i in range(0, len(body), chunk_size)
+        ]
+        return mock_response
+
+    @parameterized.expand([(1,), (3,), (16,), (4096,)])
+    @patch('utils.requests.get')
+    def test_iter_json(self, chunk_size, mock_get):
+        """Test items are decoded across arbitrary chunk boundaries"""
+        mock_get.return_value = self.mock_response(chunk_size)
+
+        result = list(iter_json("http://example.com"))
+
+        mock_get.assert_called_once_with("http://example.com", stream=True)
+        mock_get.return_value.close.assert_called_once()
+        self.assertEqual(result, self.PAYLOAD)
+
+    @patch('utils.requests.get')
+    def test_iter_json_paths(self, mock_get):
+        """Test streamed items are projected to the requested paths"""
+        mock_get.return_value = self.mock_response(7)
+
+        result = list(iter_json("http://example.com",
+                                [("name",), ("license", "key")]))
+
+        self.assertEqual(result, [
+            {"name": "r\u00e9po", "license": {"key": "mit"}},
+            {"name": "other"},
+            {},
+            {},
+            {},
+        ])
+
+    @parameterized.expand([(b'{"a": 1}',), (b'[1, 2',), (b'[1 2]',)])
+    @patch('utils.requests.get')
+    def test_iter_json_invalid(self, body, mock_get):
+        """Test malformed or non-array bodies raise ValueError"""
+        mock_get.return_value.iter_content.return_value = [body]
+        with self.assertRaises(ValueError):
+            list(iter_json("http://example.com"))
+
+    def test_project(self):
+        """Test project keeps only resolvable paths"""
+        repo = {"name": "a", "license": None, "owner": {"login": "x"}}
+        self.assertEqual(
+            project(repo, [("name",), ("license", "key"), ("owner", "login")]),
+            {"name": "a", "owner": {"login": "x"}},
+        )
+
+
 class TestMemoize(unittest.TestCase):
     """Test cases for the memoize decorator"""
 
@@ -78,3 +205,123 @@ class TestMemoize(unittest.TestCase):
             self.assertEqual(result1, 42)
             self.assertEqual(result2, 42)
             mock_method.assert_called_once()
+
+
+class TestLockedMemoize(unittest.TestCase):
+    """Test cases for the locked_memoize decorator"""
+
+    def make_class(self, **kwargs):
+        """Class with a locked_memoize property backed by a Mock"""
+        fetch = Mock(return_value=42)
+
+        class TestClass:
+            """Test class for locked_memoize testing"""
+            __slots__ = ("__weakref__",)
+
+            @locked_memoize(**kwargs)
+            def a_property(self):
+                return fetch()
+
+        return TestClass, fetch
+
+    def test_locked_memoize(self):
+        """Test values are cached per instance"""
+        TestClass, fetch = self.make_class()
+        first, second = TestClass(), TestClass()
+
+        self.assertEqual([first.a_property, first.a_property], [42, 42])
+        self.assertEqual(second.a_property, 42)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_locked_memoize_identity(self):
+        """Test equal and unhashable instances keep their own values"""
+
+        class TestClass:
+            """Test class comparing equal by name, hence unhashable"""
+            __slots__ = ("name", "value", "__weakref__")
+
+            def __init__(self, name, value):
+                """Init method of TestClass"""
+                self.name, self.value = name, value
+
+            def __eq__(self, other):
+                """Equal to any instance of the same name"""
+                return self.name == other.name
+
+            @locked_memoize
+            def a_property(self):
+                return self.value
+
+        first, second = TestClass("x", 1), TestClass("x", 2)
+        self.assertEqual([first.a_property, second.a_property], [1, 2])
+        entries = TestClass.__dict__["a_property"]._entries
+        del first
+        self.assertEqual(len(entries), 1)
+
+    def test_locked_memoize_concurrent(self):
+        """Test concurrent first accesses compute the value once"""
+        TestClass, fetch = self.make_class()
+        fetch.side_effect = lambda: time.sleep(0.05) or 42
+        instance = TestClass()
+        barrier = threading.Barrier(8)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(instance.a_property)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [42] * 8)
+        fetch.assert_called_once()
+
+    @patch('utils.time.monotonic')
+    def test_locked_memoize_ttl(self, mock_monotonic):
+        """Test values expire after ttl seconds"""
+        TestClass, fetch = self.make_class(ttl=10)
+        instance = TestClass()
+
+        mock_monotonic.return_value = 100
+        instance.a_property
+        mock_monotonic.return_value = 109
+        instance.a_property
+        fetch.assert_called_once()
+        mock_monotonic.return_value = 111
+        instance.a_property
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_locked_memoize_invalidate(self):
+        """Test del and invalidate drop the cached value"""
+        TestClass, fetch = self.make_class()
+        instance = TestClass()
+
+        instance.a_property
+        del instance.a_property
+        instance.a_property
+        invalidate(instance, "a_property")
+        instance.a_property
+        self.assertEqual(fetch.call_count, 3)
+
+        instance.a_property = 7
+        self.assertEqual(instance.a_property, 7)
+
+    def test_invalidate_memoize(self):
+        """Test invalidate also works for plain memoize attributes"""
+        fetch = Mock(return_value=42)
+
+        class TestClass:
+            """Test class for memoize invalidation"""
+            @memoize
+            def a_property(self):
+                return fetch()
+
+        instance = TestClass()
+        invalidate(instance, "a_property")
+        instance.a_property
+        invalidate(instance, "a_property")
+        instance.a_property
+        self.assertEqual(fetch.call_count, 2)
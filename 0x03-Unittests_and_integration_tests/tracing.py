@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Lightweight tracing for the github org client.
+
+Code under measurement opens spans with ``span(name, **attributes)``;
+spans nest through a context variable and are handed to every
+registered exporter when they end. With no exporter registered,
+``span`` returns a shared no-op and costs next to nothing.
+
+Example
+-------
+>>> collector = InMemoryExporter()
+>>> add_exporter(collector)
+>>> with span("outer"):
+...     with span("inner", size=3):
+...         pass
+>>> remove_exporter(collector)
+>>> [(s.name, s.parent) for s in collector.spans]
+[('inner', 'outer'), ('outer', None)]
+"""
+import contextvars
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+__all__ = [
+    "InMemoryExporter",
+    "LoggingExporter",
+    "Span",
+    "add_exporter",
+    "remove_exporter",
+    "span",
+    "start_span",
+]
+
+Exporter = Callable[["Span"], None]
+
+_exporters: List[Exporter] = []
+_current: contextvars.ContextVar = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """A timed operation with attributes"""
+    recording = True
+
+    def __init__(self, name: str, parent: "Span" = None, **attributes: Any):
+        """Init method of Span; the clock starts here"""
+        self.name = name
+        self.parent = None if parent is None else parent.name
+        self.attributes: Dict[str, Any] = attributes
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self._token = None
+
+    def set(self, key: str, value: Any) -> None:
+        """Set an attribute"""
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        """Stop the clock and export the span"""
+        self.duration = time.perf_counter() - self.start
+        for exporter in list(_exporters):
+            exporter(self)
+
+    def __enter__(self) -> "Span":
+        """Make the span current"""
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        """Restore the parent span, record any error and end"""
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.set("error", exc_type.__name__)
+        self.end()
+
+    def __repr__(self) -> str:
+        """Name, duration and attributes"""
+        return "Span({!r}, duration={}, {})".format(
+            self.name, self.duration, self.attributes
+        )
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled"""
+    recording = False
+
+    def set(self, key: str, value: Any) -> None:
+        """Ignore the attribute"""
+        pass
+
+    def end(self) -> None:
+        """Nothing to export"""
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        """Return the shared no-op span"""
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        """Nothing to restore"""
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attributes: Any) -> Span:
+    """Span to use as a context manager; it becomes the parent of
+    spans opened inside it"""
+    if not _exporters:
+        return _NOOP
+    return Span(name, _current.get(), **attributes)
+
+
+def start_span(name: str, **attributes: Any) -> Span:
+    """Span ended explicitly with ``end()``, for work that cannot sit in
+    one ``with`` block such as generators; it never becomes a parent"""
+    return span(name, **attributes)
+
+
+def add_exporter(exporter: Exporter) -> None:
+    """Call ``exporter`` with every finished span"""
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter: Exporter) -> None:
+    """Stop calling ``exporter``"""
+    _exporters.remove(exporter)
+
+
+class InMemoryExporter:
+    """Collect finished spans in a list, for tests"""
+
+    def __init__(self) -> None:
+        """Init method of InMemoryExporter"""
+        self.spans: List[Span] = []
+
+    def __call__(self, finished: Span) -> None:
+        """Collect ``finished``"""
+        self.spans.append(finished)
+
+    def names(self) -> List[str]:
+        """Names of the collected spans in finishing order"""
+        return [finished.name for finished in self.spans]
+
+    def find(self, name: str) -> List[Span]:
+        """Collected spans called ``name``"""
+        return [finished for finished in self.spans if finished.name == name]
+
+
+class LoggingExporter:
+    """Log every finished span"""
+
+    def __init__(
+        self, logger: logging.Logger = None, level: int = logging.DEBUG
+    ) -> None:
+        """Init method of LoggingExporter"""
+        self.logger = logger or logging.getLogger("github_client.trace")
+        self.level = level
+
+    def __call__(self, finished: Span) -> None:
+        """Log ``finished`` with its duration in milliseconds"""
+        self.logger.log(
+            self.level, "%s %.3fms %s", finished.name,
+            finished.duration * 1000, finished.attributes,
+        )
@@ -1,20 +1,39 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client.
 """
+import codecs
+import json
+import re
+import threading
+import time
+import weakref
 import requests
-from functools import wraps
+from functools import update_wrapper, wraps
+
+from tracing import span, start_span
 from typing import (
     Mapping,
     Sequence,
     Any,
     Dict,
     Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
 )
 
 __all__ = [
+    "MISSING",
     "access_nested_map",
+    "access_nested_maps",
+    "compile_path",
     "get_json",
+    "invalidate",
+    "iter_json",
+    "locked_memoize",
     "memoize",
+    "project",
 ]
 
 
@@ -40,11 +59,252 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     return nested_map
 
 
-def get_json(url: str) -> Dict:
+class _Missing:
+    """Sentinel type for "no default given"."""
+
+    def __repr__(self) -> str:
+        """Shown in signatures and reprs"""
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def compile_path(
+    path: Sequence, default: Any = MISSING
+) -> Callable[[Mapping], Any]:
+    """Compile a key path into a fast accessor.
+    The returned callable behaves like ``access_nested_map(m, path)``
+    but skips the ``Mapping`` ABC check for plain dicts, which is the
+    common case for decoded JSON. Anything else falls back to
+    ``access_nested_map``. If ``default`` is given it is returned
+    instead of raising ``KeyError``.
+    Parameters
+    ----------
+    path: Sequence
+        a sequence of key representing a path to the value
+    default: Any
+        value returned when the path does not resolve
+    Example
+    -------
+    >>> license_key = compile_path(("license", "key"), default=None)
+    >>> license_key({"license": {"key": "mit"}})
+    'mit'
+    >>> license_key({"license": None}) is None
+    True
+    """
+    keys = tuple(path)
+
+    def fallback(nested_map: Mapping) -> Any:
+        try:
+            return access_nested_map(nested_map, keys)
+        except KeyError:
+            if default is MISSING:
+                raise
+            return default
+
+    if len(keys) == 1:
+        key, = keys
+
+        def accessor(nested_map: Mapping) -> Any:
+            if type(nested_map) is dict and key in nested_map:
+                return nested_map[key]
+            return fallback(nested_map)
+    elif len(keys) == 2:
+        outer, inner = keys
+
+        def accessor(nested_map: Mapping) -> Any:
+            if type(nested_map) is dict:
+                value = nested_map.get(outer)
+                if type(value) is dict and inner in value:
+                    return value[inner]
+            return fallback(nested_map)
+    else:
+        def accessor(nested_map: Mapping) -> Any:
+            value = nested_map
+            for key in keys:
+                if type(value) is not dict or key not in value:
+                    return fallback(nested_map)
+                value = value[key]
+            return value
+
+    return accessor
+
+
+def access_nested_maps(
+    nested_maps: Iterable[Mapping], path: Sequence, default: Any = MISSING
+) -> List:
+    """Access the same key path in many nested maps.
+    Example
+    -------
+    >>> access_nested_maps([{"a": 1}, {"a": 2}, {}], ["a"], default=0)
+    [1, 2, 0]
+    """
+    return list(map(compile_path(path, default), nested_maps))
+
+
+def get_json(url: str, session: requests.Session = None) -> Dict:
     """Get JSON from remote URL.
+    Pass a ``requests.Session`` to reuse its connection pool.
+    Traced as ``get_json`` with ``get_json.request`` (``elapsed`` is
+    the time until headers: DNS, connect, TLS and server time) and
+    ``get_json.decode`` children.
+    """
+    with span("get_json", url=url):
+        with span("get_json.request") as trace:
+            response = (requests if session is None else session).get(url)
+            if trace.recording:
+                trace.set("status", response.status_code)
+                trace.set("elapsed", response.elapsed.total_seconds())
+                trace.set("bytes", len(response.content))
+        with span("get_json.decode") as trace:
+            payload = response.json()
+            if trace.recording and isinstance(payload, list):
+                trace.set("items", len(payload))
+    return payload
+
+
+def project(nested_map: Mapping, paths: Iterable[Sequence]) -> Dict:
+    """Copy only the given key paths of a nested map.
+    Paths that do not resolve are left out.
+    Example
+    -------
+    >>> repo = {"name": "a", "license": {"key": "mit", "url": "..."}}
+    >>> project(repo, [("name",), ("license", "key")])
+    {'name': 'a', 'license': {'key': 'mit'}}
+    """
+    return _projector(paths)(nested_map)
+
+
+def _projector(paths: Iterable[Sequence]) -> Callable[[Mapping], Dict]:
+    """Compile ``paths`` once for repeated projections"""
+    absent = object()
+    accessors = [
+        (tuple(path), compile_path(path, default=absent)) for path in paths
+    ]
+
+    def projector(nested_map: Mapping) -> Dict:
+        projected: Dict = {}
+        for path, accessor in accessors:
+            value = accessor(nested_map)
+            if value is absent:
+                continue
+            target = projected
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        return projected
+
+    return projector
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def _iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Incrementally decode a JSON array from byte chunks.
+    Items are yielded as soon as they are complete, so only one item
+    plus one chunk is buffered at a time.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer, pos, exhausted = "", 0, False
+
+    def fill() -> None:
+        nonlocal buffer, pos, exhausted
+        buffer = buffer[pos:]
+        pos = 0
+        for chunk in chunks:
+            if chunk:
+                buffer += text.decode(chunk)
+                return
+        buffer += text.decode(b"", final=True)
+        exhausted = True
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if exhausted:
+                raise ValueError("Unexpected end of JSON array")
+            fill()
+
+    if next_char() != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    if next_char() == "]":
+        return
+    while True:
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if exhausted:
+                raise
+            fill()
+            continue
+        if (
+            not exhausted
+            and isinstance(item, (int, float))
+            and not isinstance(item, bool)
+            and (end == len(buffer) or buffer[end] not in " \t\n\r,]")
+        ):
+            # A number cut after e.g. "1." decodes as its prefix; it
+            # continues in the next chunk
+            fill()
+            continue
+        yield item
+        pos = end
+        char = next_char()
+        pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError("Expected ',' or ']' in JSON array")
+        next_char()
+
+
+def iter_json(
+    url: str,
+    paths: Iterable[Sequence] = None,
+    chunk_size: int = 65536,
+    session: requests.Session = None,
+) -> Iterator[Any]:
+    """Stream the items of a JSON array from remote URL.
+    The body is parsed incrementally instead of being buffered, and
+    each item can be projected down to ``paths`` to keep only the
+    fields the caller needs. Traced as ``iter_json``, which spans the
+    whole iteration including time spent by the consumer.
     """
-    response = requests.get(url)
-    return response.json()
+    projector = _projector(paths) if paths is not None else None
+    trace = start_span("iter_json", url=url)
+    response = (requests if session is None else session).get(
+        url, stream=True
+    )
+    chunks = response.iter_content(chunk_size=chunk_size)
+    if trace.recording:
+        trace.set("status", response.status_code)
+        trace.set("elapsed", response.elapsed.total_seconds())
+        trace.set("bytes", 0)
+        trace.set("items", 0)
+        chunks = _counted(chunks, trace)
+    try:
+        for item in _iter_json_array(chunks):
+            yield projector(item) if projector is not None else item
+            if trace.recording:
+                trace.attributes["items"] += 1
+    finally:
+        response.close()
+        trace.end()
+
+
+def _counted(chunks: Iterable[bytes], trace: Any) -> Iterator[bytes]:
+    """Pass chunks through, adding their size to the span"""
+    for chunk in chunks:
+        trace.attributes["bytes"] += len(chunk)
+        yield chunk
 
 
 def memoize(fn: Callable) -> Callable:
@@ -72,4 +332,113 @@ def memoize(fn: Callable) -> Callable:
             setattr(self, attr_name, fn(self))
         return getattr(self, attr_name)
 
-    return property(memoized)
\ No newline at end of file
+    return property(memoized)
+
+
+class _LockedMemoize:
+    """Memoized property descriptor behind ``locked_memoize``.
+    Values live outside the instance, keyed by its identity like plain
+    ``memoize``, so instances that compare equal or are unhashable still
+    get their own value. An entry is dropped when its instance is
+    collected, so classes with ``__slots__`` need a ``__weakref__`` slot.
+    """
+
+    def __init__(self, fn: Callable, ttl: Optional[float] = None) -> None:
+        """Init method of _LockedMemoize"""
+        update_wrapper(self, fn)
+        self.fn = fn
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Dict] = {}
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Take the attribute name the property is bound to"""
+        self.__name__ = name
+
+    def _entry(self, instance: Any) -> Dict:
+        """Per-instance lock and cached (value, expiry) state"""
+        key = id(instance)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = {"lock": threading.Lock(), "state": None}
+                    self._entries[key] = entry
+                    # Forget it before the id can be reused
+                    weakref.finalize(instance, self._entries.pop, key, None)
+        return entry
+
+    def _fresh(self, state: Optional[tuple]) -> bool:
+        """Whether a cached (value, expiry) state can be served"""
+        return state is not None and (
+            state[1] is None or state[1] > time.monotonic()
+        )
+
+    def __get__(self, instance: Any, owner: type = None) -> Any:
+        """Cached value, computed once per instance under its lock"""
+        if instance is None:
+            return self
+        entry = self._entry(instance)
+        state = entry["state"]
+        if self._fresh(state):
+            return state[0]
+        with entry["lock"]:
+            state = entry["state"]
+            if not self._fresh(state):
+                self.__set__(instance, self.fn(instance))
+                state = entry["state"]
+            return state[0]
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        """Cache ``value``, restarting the time to live"""
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        self._entry(instance)["state"] = (value, expires)
+
+    def __delete__(self, instance: Any) -> None:
+        """Forget the cached value"""
+        entry = self._entry(instance)
+        with entry["lock"]:
+            entry["state"] = None
+
+
+def locked_memoize(
+    fn: Callable = None, *, ttl: Optional[float] = None
+) -> Callable:
+    """Thread-safe variant of ``memoize`` with optional expiry.
+    Concurrent first accesses on one instance run the method once;
+    other instances are not blocked. With ``ttl`` (seconds) the value
+    is recomputed on the first access after it expires. A value is
+    dropped with ``del obj.attr`` or ``invalidate(obj, "attr")`` and
+    can be primed by assignment.
+    Example
+    -------
+    class MyClass:
+        @locked_memoize(ttl=60)
+        def a_method(self):
+            print("a_method called")
+            return 42
+    >>> my_object = MyClass()
+    >>> my_object.a_method
+    a_method called
+    42
+    >>> del my_object.a_method
+    >>> my_object.a_method
+    a_method called
+    42
+    """
+    if fn is None:
+        return lambda fn: _LockedMemoize(fn, ttl)
+    return _LockedMemoize(fn, ttl)
+
+
+def invalidate(obj: Any, name: str) -> None:
+    """Drop the memoized value of attribute ``name`` on ``obj``.
+    Works for both ``memoize`` and ``locked_memoize`` attributes and is
+    a no-op when nothing is cached yet.
+    """
+    descriptor = getattr(type(obj), name)
+    if isinstance(descriptor, _LockedMemoize):
+        descriptor.__delete__(obj)
+    elif hasattr(obj, "_{}".format(name)):
+        delattr(obj, "_{}".format(name))
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ChatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chats'
+
+    def ready(self):
+        import chats.signals  # noqa: F401
+        from chats.search import install_search_index
+
+        post_migrate.connect(install_search_index, sender=self)
@@ -1,16 +1,134 @@
 # messaging_app/chats/auth.py
-from rest_framework_simplejwt.authentication import JWTAuthentication
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 
 User = get_user_model()
 
+
+class LocalUserCache:
+    """
+    Small thread-safe LRU of user instances with a time to live, kept in
+    front of the Django cache so most requests skip even that round trip.
+    Entries are trusted until they expire, so other processes see a
+    change to a user within the time to live.
+    """
+    def __init__(self, maxsize=1024, timeout=5):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_users = LocalUserCache(
+    maxsize=getattr(settings, 'CHATS_JWT_USER_LOCAL_CACHE_SIZE', 1024),
+    timeout=getattr(settings, 'CHATS_JWT_USER_LOCAL_CACHE_TIMEOUT', 5),
+)
+
+
+def _version_key(user_id):
+    return f'chats:jwt-user-version:{user_id}'
+
+
+def user_cache_version(user_id):
+    """
+    Current cache version of a user, kept in the shared Django cache.
+    A fresh random version is started when none is stored, so entries
+    cached under an evicted version can never be read again.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user(user_id):
+    """
+    Make every process stop serving its cached copy of the user: this one
+    at once, others within CHATS_JWT_USER_LOCAL_CACHE_TIMEOUT. The version
+    is bumped again on commit, as a request could cache the old row until
+    the change is visible.
+    """
+    def bump():
+        cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+        local_users.discard(str(user_id))
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_cached_user(user_id):
+    """
+    The user with user_id, from the local LRU, then the Django cache, then
+    the database. Shared entries are keyed by user_id and the user's cache
+    version, which chats.signals bumps whenever the user is saved or
+    deleted; a local hit skips reading the version. Returns None for
+    unknown users.
+    """
+    user = local_users.get(str(user_id))
+    if user is None:
+        key = f'chats:jwt-user:{user_id}:{user_cache_version(user_id)}'
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User.objects.get(user_id=user_id)
+            except (User.DoesNotExist, ValueError):
+                return None
+            cache.set(key, user, getattr(settings, 'CHATS_JWT_USER_CACHE_TIMEOUT', 60))
+        local_users.set(str(user_id), user)
+    # Requests may modify request.user; never hand out the shared instance
+    return copy.copy(user)
+
+
 class CustomJWTAuthentication(JWTAuthentication):
     def get_user(self, validated_token):
         """
         Attempts to find and return a user using the given validated token.
         """
-        try:
-            user_id = validated_token[self.user_id_field]
-            return User.objects.get(**{self.user_id_field: user_id})
-        except User.DoesNotExist:
-            return None
\ No newline at end of file
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return None
+        user = get_cached_user(user_id)
+        if user is not None and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
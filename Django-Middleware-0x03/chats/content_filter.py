@@ -0,0 +1,192 @@
+# chats/content_filter.py
+"""
+Offensive-term screening for message bodies.
+
+Terms are compiled into an Aho-Corasick automaton over words: the text
+is split into lowercase words by one regular expression, and the
+automaton consumes them in a single pass, reporting any term (a word or
+a phrase of several words) that ends at the current word. The cost of a
+scan grows with the text, not with the number of terms, and matches
+always fall on whole words.
+
+FileContentFilter rebuilds its automaton when its term file changes, so
+the list can be edited without restarting workers. get_content_filter()
+returns the filter configured by the CHATS_OFFENSIVE_TERMS* settings.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase words of text"""
+    return WORD_RE.findall(text.lower())
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton whose alphabet is words"""
+    def __init__(self, terms):
+        goto, lengths = [{}], [0]
+        for term in terms:
+            words = tokenize(term)
+            if not words:
+                continue
+            node = 0
+            for word in words:
+                child = goto[node].get(word)
+                if child is None:
+                    child = goto[node][word] = len(goto)
+                    goto.append({})
+                    lengths.append(0)
+                node = child
+            lengths[node] = len(words)
+
+        # Breadth-first, so a node's failure link is final before its children need it
+        fail = [0] * len(goto)
+        # Length of the longest term ending at each node, following failure links
+        ends = lengths[:]
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and word not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(word, 0) if node else 0
+                ends[child] = ends[child] or ends[fail[child]]
+        self.goto = goto
+        self.fail = fail
+        self.ends = ends
+        self.size = len(goto) - 1
+
+    def __bool__(self):
+        return self.size > 0
+
+    def find(self, text):
+        """The first term found in text, as its lowercase words joined by spaces, or None"""
+        goto, fail, ends = self.goto, self.fail, self.ends
+        root = goto[0]
+        words = tokenize(text)
+        node = 0
+        for index, word in enumerate(words):
+            if node:
+                while node and word not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(word, 0)
+            else:
+                node = root.get(word, 0)
+            if ends[node]:
+                return ' '.join(words[index - ends[node] + 1:index + 1])
+        return None
+
+
+class ContentFilter:
+    """Finds offensive terms in text"""
+    def __init__(self, terms):
+        self.automaton = AhoCorasick(terms)
+
+    def __bool__(self):
+        return bool(self.automaton)
+
+    def find(self, text):
+        """The first offensive term in text, or None"""
+        return self.automaton.find(text)
+
+
+def read_terms(path):
+    """Terms of a term file: one per line, blank lines and # comments ignored"""
+    with open(path, encoding='utf-8') as terms_file:
+        return [line.strip() for line in terms_file if line.strip() and not line.lstrip().startswith('#')]
+
+
+class FileContentFilter(ContentFilter):
+    """
+    ContentFilter over a term file plus fixed terms. At most every
+    check_interval seconds a scan checks whether the file changed and,
+    if so, rebuilds the automaton; scans in other threads keep using the
+    previous one meanwhile. A file that cannot be read keeps the last
+    good automaton.
+    """
+    def __init__(self, path, terms=(), check_interval=5.0, clock=time.monotonic):
+        self.path = path
+        self.terms = list(terms)
+        self.check_interval = check_interval
+        self.clock = clock
+        self._signature = None
+        self._next_check = 0
+        self._lock = threading.Lock()
+        super().__init__(self.terms)
+        self.reload()
+
+    def reload(self):
+        """Rebuild the automaton if the file changed; returns whether it did"""
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return False
+            automaton = AhoCorasick(self.terms + read_terms(self.path))
+        except OSError as error:
+            logger.warning('Cannot load offensive terms from %s: %s', self.path, error)
+            return False
+        self.automaton, self._signature = automaton, signature
+        return True
+
+    def _check(self):
+        now = self.clock()
+        if now >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._next_check = now + self.check_interval
+                self.reload()
+            finally:
+                self._lock.release()
+
+    def __bool__(self):
+        self._check()
+        return super().__bool__()
+
+    def find(self, text):
+        self._check()
+        return super().find(text)
+
+
+_content_filter = None
+
+
+def get_content_filter():
+    """
+    The filter configured by settings: CHATS_OFFENSIVE_TERMS, plus the
+    terms of CHATS_OFFENSIVE_TERMS_FILE, checked for changes every
+    CHATS_OFFENSIVE_TERMS_RELOAD_INTERVAL seconds. Returns None when
+    neither is set.
+    """
+    global _content_filter
+    terms = getattr(settings, 'CHATS_OFFENSIVE_TERMS', [])
+    path = getattr(settings, 'CHATS_OFFENSIVE_TERMS_FILE', None)
+    if _content_filter is None:
+        if path:
+            _content_filter = FileContentFilter(
+                path, terms, getattr(settings, 'CHATS_OFFENSIVE_TERMS_RELOAD_INTERVAL', 5.0)
+            )
+        else:
+            _content_filter = ContentFilter(terms)
+    # A term file may gain terms later; a fixed empty list never will
+    return _content_filter if path or _content_filter else None
+
+@receiver(setting_changed)
+def reset_content_filter(setting, **kwargs):
+    global _content_filter
+    if setting.startswith('CHATS_OFFENSIVE_TERMS'):
+        _content_filter = None
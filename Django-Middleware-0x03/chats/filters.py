@@ -1,6 +1,8 @@
 # chats/filters.py
 import django_filters
+from rest_framework.filters import SearchFilter
 from .models import Message, Conversation
+from .search import search_messages
 from django_filters import rest_framework as filters
 
 class MessageFilter(filters.FilterSet):
@@ -8,11 +10,15 @@ class MessageFilter(filters.FilterSet):
     sender = filters.UUIDFilter(field_name='sender__user_id')
     sent_after = filters.DateTimeFilter(field_name='sent_at', lookup_expr='gte')
     sent_before = filters.DateTimeFilter(field_name='sent_at', lookup_expr='lte')
-    search = filters.CharFilter(field_name='message_body', lookup_expr='icontains')
+    search = filters.CharFilter(method='filter_search')
     
     class Meta:
         model = Message
         fields = ['conversation', 'sender', 'sent_after', 'sent_before', 'search']
+    
+    def filter_search(self, queryset, name, value):
+        # Full-text search, best matches first
+        return search_messages(queryset, value)
 
 class ConversationFilter(filters.FilterSet):
     participant = filters.UUIDFilter(field_name='participants__user_id')
@@ -21,4 +27,21 @@ class ConversationFilter(filters.FilterSet):
     
     class Meta:
         model = Conversation
-        fields = ['participant', 'created_after', 'created_before']
\ No newline at end of file
+        fields = ['participant', 'created_after', 'created_before']
+
+class MessageSearchFilter(SearchFilter):
+    """
+    SearchFilter that sends '@message_body' to the full-text search
+    backend (see chats.search); any other search_fields must match too.
+    """
+    full_text_field = '@message_body'
+    
+    def get_search_fields(self, view, request):
+        fields = super().get_search_fields(view, request) or []
+        return [field for field in fields if field != self.full_text_field]
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if query and self.full_text_field in (SearchFilter.get_search_fields(self, view, request) or []):
+            queryset = search_messages(queryset, query)
+        return super().filter_queryset(request, queryset, view)
@@ -0,0 +1,70 @@
+# chats/management/commands/bench_content_filter.py
+import random
+import re
+import string
+import time
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from chats.content_filter import ContentFilter
+
+
+def random_words(count, rng):
+    return [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = 'Throughput of offensive-term screening on large term lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', type=int, default=10000)
+        parser.add_argument('--phrases', type=float, default=0.3,
+                            help='share of the terms made of two or three words')
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                            help='message body sizes in characters')
+        parser.add_argument('--loop-terms', type=int, default=1000,
+                            help='terms used by the per-term regex baseline')
+
+    def report(self, name, fn, size, seconds=0.5):
+        # Enough calls to run for about `seconds`
+        number = max(int(seconds / max(timeit.timeit(fn, number=1), 1e-7)), 1)
+        elapsed = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        self.stdout.write(f'{name:<40} {elapsed * 1e6:>12.1f} {size / elapsed / 1e6:>10.2f}')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        count = options['terms']
+        phrase_count = int(count * options['phrases'])
+        terms = random_words(count - phrase_count, rng)
+        terms += [' '.join(random_words(rng.randint(2, 3), rng)) for _ in range(phrase_count)]
+
+        start = time.perf_counter()
+        content_filter = ContentFilter(terms)
+        self.stdout.write(f'ContentFilter build[{count}]: {(time.perf_counter() - start) * 1000:.1f}ms')
+        start = time.perf_counter()
+        alternation = re.compile(
+            r'\b(?:%s)\b' % '|'.join(r'\W+'.join(map(re.escape, term.split())) for term in terms),
+            re.IGNORECASE
+        )
+        self.stdout.write(f'alternation regex build[{count}]: {(time.perf_counter() - start) * 1000:.1f}ms')
+        per_term = [re.compile(rf'\b{re.escape(term)}\b', re.IGNORECASE) for term in terms[:options['loop_terms']]]
+        loop_factor = count / len(per_term)
+
+        # Bodies never contain a term word, so every scan reads the whole body
+        vocabulary = {word for term in terms for word in term.split()}
+        self.stdout.write(f"{'case':<40} {'us/body':>12} {'MB/s':>10}")
+        for size in options['sizes']:
+            words = []
+            length = 0
+            while length < size:
+                words.extend(word for word in random_words(100, rng) if word not in vocabulary)
+                length = sum(len(word) + 1 for word in words)
+            body = ' '.join(words)[:size]
+            assert content_filter.find(body) is None
+            self.report(f'ContentFilter.find[{size}]', lambda: content_filter.find(body), size)
+            self.report(f'alternation regex[{size}]', lambda: alternation.search(body), size)
+            # Measured on a slice of the terms; scales linearly with their number
+            elapsed = min(timeit.repeat(lambda: any(p.search(body) for p in per_term), number=1, repeat=3))
+            elapsed *= loop_factor
+            self.stdout.write(f"{f'per-term regex loop[{size}]':<40} {elapsed * 1e6:>12.1f} {size / elapsed / 1e6:>10.2f}")
@@ -0,0 +1,70 @@
+# chats/management/commands/bench_ingest.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chats.management.benchmark import rolled_back
+from chats.models import Conversation, User
+from chats.views import ConversationViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare messages per second of send_message and send_messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='messages per send_messages request')
+
+    def handle(self, *args, **options):
+        # Measure ingestion, not the send throttle
+        unthrottled = {'rate': 1e9, 'capacity': 1e9, 'bulk_capacity': 1e9, 'backend': 'memory'}
+        with override_settings(CHATS_TOKEN_BUCKET=unthrottled), rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        total, batch_size = options['messages'], options['batch_size']
+        self.factory = APIRequestFactory()
+        self.sender = User.objects.create_user(f'bench-{uuid.uuid4().hex}@example.com', 'Bench', 'User')
+
+        def single(conversation):
+            view = ConversationViewSet.as_view(
+                {'post': 'send_message'}, **ConversationViewSet.send_message.kwargs
+            )
+            for i in range(total):
+                # send_message validates with MessageCreateSerializer, which wants the IDs too
+                self.post(view, conversation, {
+                    'sender_id': str(self.sender.pk),
+                    'conversation_id': str(conversation.pk),
+                    'message_body': f'message {i}',
+                })
+
+        def bulk(conversation):
+            view = ConversationViewSet.as_view(
+                {'post': 'send_messages'}, **ConversationViewSet.send_messages.kwargs
+            )
+            for start in range(0, total, batch_size):
+                count = min(batch_size, total - start)
+                self.post(view, conversation, {
+                    'messages': [{'message_body': f'message {start + i}'} for i in range(count)]
+                })
+
+        self.stdout.write(f"{'endpoint':>14} {'messages':>10} {'seconds':>10} {'messages/s':>12}")
+        for name, send in (('send_message', single), ('send_messages', bulk)):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.sender)
+            started = time.perf_counter()
+            send(conversation)
+            elapsed = time.perf_counter() - started
+            conversation.refresh_from_db()
+            assert conversation.message_count == total, (name, conversation.message_count)
+            self.stdout.write(f'{name:>14} {total:>10,} {elapsed:>10.2f} {total / elapsed:>12,.0f}')
+
+    def post(self, view, conversation, data):
+        request = self.factory.post('/api/conversations/', data, format='json')
+        force_authenticate(request, user=self.sender)
+        response = view(request, pk=conversation.pk)
+        assert response.status_code == 201, response.data
@@ -0,0 +1,78 @@
+# chats/management/commands/bench_middleware.py
+import itertools
+import json
+import random
+import re
+import string
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from chats.content_filter import ContentFilter
+from chats.middleware import (
+    OffensiveLanguageMiddleware,
+    RateLimitMiddleware,
+    RestrictAccessByTimeMiddleware,
+    RolePermissionMiddleware,
+)
+from chats.ratelimit import CacheStore, MemoryStore, SlidingWindowLimiter
+
+
+def ok(request):
+    return HttpResponse()
+
+
+def random_words(count, rng):
+    return [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmarks of the chats middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000)
+        parser.add_argument('--terms', type=int, default=1000)
+
+    def report(self, name, fn, number):
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        self.stdout.write(f'{name:<40} {seconds / number * 1e6:>10.2f}')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        rng = random.Random(0)
+        factory = RequestFactory()
+        terms = random_words(options['terms'], rng)
+        phrases = [' '.join(random_words(2, rng)) for _ in range(options['terms'])]
+        body = ' '.join(random_words(200, rng))
+        post = factory.post('/api/messages/', json.dumps({'message_body': body}), content_type='application/json')
+        post.body  # read once, as Django does before the view
+        admin = factory.get('/admin/')
+        admin.user = AnonymousUser()
+
+        self.stdout.write(f"{'case':<40} {'us/call':>10}")
+        with override_settings(CHATS_ACCESS_HOURS=(0, 23), CHATS_OFFENSIVE_TERMS=terms,
+                               CHATS_RATE_LIMIT={'limit': 10 ** 9, 'window': 60}):
+            self.report('RestrictAccessByTimeMiddleware', lambda m=RestrictAccessByTimeMiddleware(ok): m(post), number)
+            self.report(f'OffensiveLanguageMiddleware[{len(terms)}]', lambda m=OffensiveLanguageMiddleware(ok): m(post), number)
+            self.report('RateLimitMiddleware[memory]', lambda m=RateLimitMiddleware(ok): m(post), number)
+            self.report('RolePermissionMiddleware', lambda m=RolePermissionMiddleware(ok): m(admin), number)
+
+        # Screening: compiled filter against checking every term
+        content_filter = ContentFilter(terms)
+        term_set = set(terms)
+        per_term = [re.compile(rf'\b{re.escape(term)}\b', re.IGNORECASE) for term in terms]
+        phrase_filter = ContentFilter(phrases)
+        self.report('ContentFilter.find[words]', lambda: content_filter.find(body), number // 10)
+        self.report('ContentFilter.find[phrases]', lambda: phrase_filter.find(body), number // 10)
+        self.report('per-word set lookup', lambda: any(word in term_set for word in body.lower().split()), number // 10)
+        self.report('per-term regex loop', lambda: any(p.search(body) for p in per_term), max(number // 1000, 1))
+
+        # Limiter stores
+        keys = [f'10.0.{i // 256}.{i % 256}' for i in range(1000)]
+        for name, store in (('memory', MemoryStore()), ('cache', CacheStore())):
+            limiter = SlidingWindowLimiter(10 ** 9, 60, store)
+            hits = itertools.cycle(keys)
+            self.report(f'SlidingWindowLimiter.hit[{name}]', lambda: limiter.hit(next(hits)), number)
@@ -0,0 +1,77 @@
+# chats/management/commands/bench_pagination.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from chats.management.benchmark import rolled_back
+from chats.models import Conversation, Message, User
+from chats.pagination import MessageKeysetPagination, MessagePagination
+
+
+class Command(BaseCommand):
+    help = 'Compare page-number and keyset pagination on one large conversation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--depths', type=float, nargs='+', default=[0.0, 0.5, 0.99],
+            help='page positions to time, as fractions of the conversation'
+        )
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        total = options['messages']
+        sender = User.objects.create_user(
+            f'bench-{uuid.uuid4().hex}@example.com', 'Bench', 'User'
+        )
+        conversation = Conversation.objects.create()
+        conversation.participants.add(sender)
+
+        self.stdout.write(f'Creating {total:,} messages...')
+        for start in range(0, total, options['batch_size']):
+            count = min(options['batch_size'], total - start)
+            Message.objects.bulk_create(
+                Message(sender=sender, conversation=conversation, message_body=f'message {start + i}')
+                for i in range(count)
+            )
+
+        factory = APIRequestFactory()
+        messages = conversation.messages.all()
+        page_size = MessagePagination.page_size
+        self.stdout.write(f"{'depth':>8} {'mode':>8} {'ms':>10} {'queries':>8}")
+        for depth in options['depths']:
+            offset = min(int(total * depth), max(total - page_size, 0))
+            page = offset // page_size + 1
+            keyset = MessageKeysetPagination()
+            cursor = None
+            if offset:
+                # The cursor a client would hold after reading `offset` rows
+                last = messages.order_by('sent_at', 'message_id')[offset - 1]
+                cursor = keyset.encode_cursor(last, False)
+
+            cases = [
+                ('page', MessagePagination, {'page': page}),
+                ('keyset', MessageKeysetPagination, {'pagination': 'cursor', **({'cursor': cursor} if cursor else {})}),
+            ]
+            for mode, paginator_class, params in cases:
+                request = Request(factory.get('/api/messages/', params))
+                best = None
+                for _ in range(options['repeat']):
+                    paginator = paginator_class()
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        rows = paginator.paginate_queryset(messages, request)
+                        elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                assert len(rows) == min(page_size, total), (mode, len(rows))
+                self.stdout.write(f'{depth:>8.2f} {mode:>8} {best * 1000:>10.2f} {len(queries):>8}')
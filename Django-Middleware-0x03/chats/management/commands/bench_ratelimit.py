@@ -0,0 +1,53 @@
+# chats/management/commands/bench_ratelimit.py
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from chats.models import RateLimitBucket
+from chats.ratelimit import TokenBucketLimiter, get_bucket_store
+
+
+class Command(BaseCommand):
+    help = 'Per-request overhead and concurrent correctness of the token bucket backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--capacity', type=int, default=200)
+        parser.add_argument('--backends', nargs='+', default=['memory', 'cache', 'database'])
+
+    def handle(self, *args, **options):
+        total, threads, capacity = options['requests'], options['threads'], options['capacity']
+        run = f'bench:{time.time()}'
+        self.stdout.write(f"{'backend':>10} {'us/request':>12} {'threads':>8} {'allowed':>8} {'expected':>9}")
+        for backend in options['backends']:
+            store = get_bucket_store(backend)
+
+            # Overhead: every request allowed, keys spread over 1000 users
+            limiter = TokenBucketLimiter(1e9, 1e9, store)
+            started = time.perf_counter()
+            for i in range(total):
+                limiter.take(f'{run}:{backend}:user:{i % 1000}')
+            overhead = (time.perf_counter() - started) / total
+
+            # Correctness: no refill, so exactly capacity requests may pass
+            limiter = TokenBucketLimiter(1e-9, capacity, store)
+            key = f'{run}:{backend}:shared'
+            allowed = []
+
+            def worker():
+                passed = sum(limiter.take(key)[0] for _ in range(capacity * 2 // threads + 1))
+                allowed.append(passed)
+                connection.close()
+
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            self.stdout.write(
+                f'{backend:>10} {overhead * 1e6:>12.2f} {threads:>8} {sum(allowed):>8} {capacity:>9}'
+            )
+        RateLimitBucket.objects.filter(key__startswith=run).delete()
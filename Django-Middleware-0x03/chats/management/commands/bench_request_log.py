@@ -0,0 +1,57 @@
+# chats/management/commands/bench_request_log.py
+import os
+import tempfile
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from chats.middleware import RequestLoggingMiddleware
+from chats.request_log import BufferedLogWriter
+
+
+class SyncLogWriter:
+    """The previous behaviour: open, append and close for every line"""
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, line):
+        with open(self.path, 'a') as log_file:
+            log_file.write(line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request cost of synchronous and buffered request logging'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        request = RequestFactory().get('/api/conversations/')
+        request.user = AnonymousUser()
+        middleware = RequestLoggingMiddleware(lambda request: HttpResponse())
+
+        self.stdout.write(f"{'writer':>10} {'requests':>10} {'us/request':>12} {'requests/s':>12} {'lines':>10}")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, writer_class in (('sync', SyncLogWriter), ('buffered', BufferedLogWriter)):
+                path = os.path.join(directory, f'{name}.log')
+                middleware.writer = writer_class(path)
+                started = time.perf_counter()
+                for _ in range(total):
+                    middleware(request)
+                elapsed = time.perf_counter() - started
+                middleware.writer.close()
+                with open(path) as log_file:
+                    lines = sum(1 for _ in log_file)
+                self.stdout.write(
+                    f'{name:>10} {total:>10,} {elapsed / total * 1e6:>12.2f} {total / elapsed:>12,.0f} {lines:>10,}'
+                )
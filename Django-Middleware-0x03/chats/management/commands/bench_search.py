@@ -0,0 +1,72 @@
+# chats/management/commands/bench_search.py
+import itertools
+import random
+import string
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from chats.management.benchmark import rolled_back
+from chats.models import Conversation, Message, User
+from chats.search import SearchBackend, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Compare substring and full-text search of message bodies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        rng = random.Random(0)
+        total = options['messages']
+        # Zipf-like word frequencies, as in real text
+        vocabulary = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+                      for _ in range(options['vocabulary'])]
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+        sender = User.objects.create_user(f'bench-{uuid.uuid4().hex}@example.com', 'Bench', 'User')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(sender)
+
+        self.stdout.write(f'Creating {total:,} messages...')
+        started = time.perf_counter()
+        for start in range(0, total, options['batch_size']):
+            count = min(options['batch_size'], total - start)
+            Message.objects.bulk_create(
+                Message(sender=sender, conversation=conversation,
+                        message_body=' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(5, 30))))
+                for _ in range(count)
+            )
+        self.stdout.write(f'Inserted and indexed in {time.perf_counter() - started:.1f}s')
+
+        messages = Message.objects.all()
+        backends = [('substring', SearchBackend()), ('full-text', get_search_backend())]
+        queries = [
+            ('common word', vocabulary[0]),
+            ('rare word', vocabulary[-1]),
+            ('two words', f'{vocabulary[5]} {vocabulary[50]}'),
+            ('no match', 'zzzzzzzzzz'),
+        ]
+        self.stdout.write(f"{'query':<14} {'backend':<12} {'matches':>9} {'count ms':>10} {'page ms':>10}")
+        for label, query in queries:
+            for name, backend in backends:
+                found = backend.search(messages, query)
+                count_ms = page_ms = None
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    matches = found.count()
+                    elapsed = (time.perf_counter() - started) * 1000
+                    count_ms = elapsed if count_ms is None else min(count_ms, elapsed)
+                    started = time.perf_counter()
+                    list(found[:20])
+                    elapsed = (time.perf_counter() - started) * 1000
+                    page_ms = elapsed if page_ms is None else min(page_ms, elapsed)
+                self.stdout.write(f'{label:<14} {name:<12} {matches:>9,} {count_ms:>10.2f} {page_ms:>10.2f}')
@@ -0,0 +1,23 @@
+# chats/management/commands/rebuild_conversation_stats.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chats.models import Conversation
+
+
+class Command(BaseCommand):
+    help = 'Recompute last_message, last_message_at and message_count of conversations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'conversation_ids', nargs='*',
+            help='conversations to rebuild (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        conversations = Conversation.objects.all()
+        if options['conversation_ids']:
+            conversations = conversations.filter(pk__in=options['conversation_ids'])
+        with transaction.atomic():
+            updated = conversations.rebuild_stats()
+        self.stdout.write(f'Rebuilt {updated} conversation(s)')
@@ -0,0 +1,30 @@
+# chats/management/commands/rebuild_message_search.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from chats.search import backend_class, get_search_backend, reset_search_backends
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search index of message bodies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        cls = backend_class(connection)
+        if not cls.is_supported(connection):
+            raise CommandError(f'{cls.__name__} is not supported by database {using!r}')
+        started = time.perf_counter()
+        with transaction.atomic(using=using):
+            cls(using).rebuild()
+        # A backend that was missing may be available now
+        reset_search_backends('CHATS_SEARCH_BACKEND')
+        self.stdout.write(
+            f'Rebuilt {get_search_backend(using).__class__.__name__} index '
+            f'in {time.perf_counter() - started:.2f}s'
+        )
@@ -0,0 +1,80 @@
+# chats/membership.py
+"""
+Conversation membership checks, cached on the request.
+
+Each check is a single EXISTS on the participants table, whose
+(conversation_id, user_id) unique index answers it without touching the
+conversation or user rows. Answers are kept on the underlying
+HttpRequest, so the permission classes and the views share them.
+
+The set of a user's conversation IDs is also kept in the Django cache
+across requests; chats.signals drops it whenever participants change,
+and again once the change commits.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Conversation
+
+Participant = Conversation.participants.through
+
+
+def membership_cache_key(user_id):
+    return f'chats:membership:{user_id}'
+
+
+def invalidate_membership(user_ids):
+    """Forget the cached conversation sets of user_ids, now and after commit"""
+    keys = [membership_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # Until the change commits, other requests still read the old members
+    # and may cache them again
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _load_conversation_ids(user_id):
+    key = membership_cache_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = set(Participant.objects.filter(user_id=user_id).values_list('conversation_id', flat=True))
+        cache.set(key, ids, getattr(settings, 'CHATS_MEMBERSHIP_CACHE_TIMEOUT', 300))
+    return ids
+
+
+def _request_cache(request):
+    # DRF wraps the HttpRequest; keep the cache on the shared inner request
+    request = getattr(request, '_request', request)
+    state = getattr(request, '_chats_membership', None)
+    if state is None:
+        state = request._chats_membership = {'checked': {}, 'ids': None}
+    return state
+
+
+def member_conversation_ids(request):
+    """Set of IDs of the conversations request.user takes part in, read once per request"""
+    request_cache = _request_cache(request)
+    if request_cache['ids'] is None:
+        request_cache['ids'] = _load_conversation_ids(request.user.pk)
+    return request_cache['ids']
+
+
+def is_participant(request, conversation):
+    """Whether request.user takes part in conversation (an instance or its ID)"""
+    conversation_id = getattr(conversation, 'pk', conversation)
+    request_cache = _request_cache(request)
+    if request_cache['ids'] is None:
+        # A warm cross-request set answers without a query
+        request_cache['ids'] = cache.get(membership_cache_key(request.user.pk))
+    if request_cache['ids'] is not None:
+        return conversation_id in request_cache['ids']
+    checked = request_cache['checked']
+    if conversation_id not in checked:
+        prefetched = getattr(conversation, '_prefetched_objects_cache', {}).get('participants')
+        if prefetched is not None:
+            checked[conversation_id] = any(user.pk == request.user.pk for user in prefetched)
+        else:
+            checked[conversation_id] = Participant.objects.filter(
+                conversation_id=conversation_id, user_id=request.user.pk
+            ).exists()
+    return checked[conversation_id]
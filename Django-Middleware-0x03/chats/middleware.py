@@ -1,24 +1,153 @@
 # chats/middleware.py
+import json
+import re
 from datetime import datetime
-import os
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from .content_filter import get_content_filter
+from .ratelimit import CacheStore, MemoryStore, SlidingWindowLimiter
+from .request_log import get_writer
 
 class RequestLoggingMiddleware:
+    """
+    Logs user and path of every request to requests.log. Lines are handed
+    to a background writer (see chats.request_log), configured with the
+    CHATS_REQUEST_LOG setting, so the request never waits on the file.
+    """
     def __init__(self, get_response):
         self.get_response = get_response
+        options = dict(getattr(settings, 'CHATS_REQUEST_LOG', {}))
+        self.writer = get_writer(options.pop('path', 'requests.log'), **options)
         
     def __call__(self, request):
         # Process request
         user = "Anonymous"
         if hasattr(request, 'user') and request.user.is_authenticated:
-            user = request.user.username
+            user = request.user.get_username()
             
         # Log the request
         log_entry = f"{datetime.now()} - User: {user} - Path: {request.path}\n"
-        
-        # Write to requests.log file
-        log_file_path = 'requests.log'
-        with open(log_file_path, 'a') as log_file:
-            log_file.write(log_entry)
+        self.writer.write(log_entry)
         
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+
+class RestrictAccessByTimeMiddleware:
+    """
+    Denies access to the chat outside the hours in CHATS_ACCESS_HOURS,
+    a (start, end) pair of hours in local time, 6PM to 9PM by default.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.start, self.end = getattr(settings, 'CHATS_ACCESS_HOURS', (18, 21))
+        if (self.start, self.end) == (0, 24):
+            raise MiddlewareNotUsed
+    
+    def __call__(self, request):
+        hour = datetime.now().hour
+        if self.start <= self.end:
+            allowed = self.start <= hour < self.end
+        else:
+            # Windows crossing midnight, e.g. (22, 6)
+            allowed = hour >= self.start or hour < self.end
+        if not allowed:
+            return JsonResponse(
+                {'error': f'The chat is only open between {self.start}:00 and {self.end}:00'},
+                status=403
+            )
+        return self.get_response(request)
+
+class OffensiveLanguageMiddleware:
+    """
+    Rejects JSON requests whose message_body (or bodies, for bulk sends)
+    contain an offensive term (see content_filter.get_content_filter).
+    The raw body is screened first, so clean requests are never parsed
+    here.
+    """
+    methods = {'POST', 'PUT', 'PATCH'}
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.filter = get_content_filter()
+        if self.filter is None:
+            raise MiddlewareNotUsed
+    
+    def __call__(self, request):
+        if request.method in self.methods and request.content_type == 'application/json':
+            term = self.offensive_term(request.body)
+            if term is not None:
+                return JsonResponse({'error': 'Message contains offensive language'}, status=400)
+        return self.get_response(request)
+    
+    def offensive_term(self, body):
+        text = body.decode('utf-8', errors='replace')
+        # Any JSON escape (\n, \t, \u...) could hide or split a term, so
+        # only bodies without backslashes can be cleared unparsed
+        if '\\' not in text and self.filter.find(text) is None:
+            return None
+        # A term somewhere in the body; only message bodies count
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        items = data.get('messages') if isinstance(data, dict) else None
+        items = items if isinstance(items, list) else [data]
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get('message_body'), str):
+                term = self.filter.find(item['message_body'])
+                if term is not None:
+                    return term
+        return None
+
+class RateLimitMiddleware:
+    """
+    Limits message sending per client IP: at most CHATS_RATE_LIMIT['limit']
+    POSTs to the message paths in any 'window' seconds, counted in process
+    memory or, with 'backend': 'cache', in the shared Django cache.
+    """
+    default_paths = [r'^/api/messages/', r'^/api/conversations/[^/]+/send_messages?/']
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, 'CHATS_RATE_LIMIT', {})
+        store = CacheStore() if options.get('backend') == 'cache' else MemoryStore()
+        self.limiter = SlidingWindowLimiter(options.get('limit', 5), options.get('window', 60), store)
+        self.paths = re.compile('|'.join(f'(?:{path})' for path in options.get('paths', self.default_paths)))
+    
+    def __call__(self, request):
+        if request.method == 'POST' and self.paths.match(request.path):
+            allowed, retry_after = self.limiter.hit(request.META.get('REMOTE_ADDR', ''))
+            if not allowed:
+                response = JsonResponse({'error': 'Too many messages, slow down'}, status=429)
+                response['Retry-After'] = str(max(int(retry_after + 0.999), 1))
+                return response
+        return self.get_response(request)
+
+class RolePermissionMiddleware:
+    """
+    Allows requests under the path prefixes of CHATS_ROLE_PERMISSIONS only
+    to authenticated users with one of the listed roles. All prefixes are
+    matched by one compiled pattern.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        permissions = getattr(settings, 'CHATS_ROLE_PERMISSIONS', {'/admin/': ['admin']})
+        if not permissions:
+            raise MiddlewareNotUsed
+        # Longest prefix first so nested prefixes win
+        prefixes = sorted(permissions, key=len, reverse=True)
+        self.roles = [frozenset(permissions[prefix]) for prefix in prefixes]
+        self.pattern = re.compile('|'.join(f'({re.escape(prefix)})' for prefix in prefixes))
+    
+    def __call__(self, request):
+        match = self.pattern.match(request.path)
+        if match is not None:
+            roles = self.roles[match.lastindex - 1]
+            user = getattr(request, 'user', None)
+            if user is None or not user.is_authenticated or getattr(user, 'role', None) not in roles:
+                return JsonResponse({'error': 'You do not have permission to access this resource'}, status=403)
+        return self.get_response(request)
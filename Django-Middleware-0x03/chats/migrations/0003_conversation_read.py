@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0002_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationRead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_at', models.DateTimeField()),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reads', to='chats.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_reads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'conversation_read',
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_conversation_stats(apps, schema_editor):
+    Conversation = apps.get_model('chats', 'Conversation')
+    Message = apps.get_model('chats', 'Message')
+    messages = Message.objects.filter(conversation_id=models.OuterRef('pk'))
+    last_message = messages.order_by('-sent_at', '-message_id')[:1]
+    count = messages.order_by().values('conversation_id').annotate(total=models.Count('pk')).values('total')
+    Conversation.objects.update(
+        last_message=models.Subquery(last_message.values('message_id')),
+        last_message_at=models.Subquery(last_message.values('sent_at')),
+        message_count=Coalesce(models.Subquery(count), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_conversation_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chats.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_message_at'], name='conversation_activity_idx'),
+        ),
+        migrations.RunPython(fill_conversation_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 21:10
+
+from django.conf import settings
+from django.db import migrations
+
+# Frozen copies of what chats.search installs, so that this migration
+# keeps working whatever that module becomes
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5("
+    "message_body, content='message', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message BEGIN "
+    "INSERT INTO message_fts(rowid, message_body) VALUES (new.rowid, new.message_body); END",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message BEGIN "
+    "INSERT INTO message_fts(message_fts, rowid, message_body) VALUES ('delete', old.rowid, old.message_body); END",
+    "CREATE TRIGGER IF NOT EXISTS message_fts_update AFTER UPDATE OF message_body ON message BEGIN "
+    "INSERT INTO message_fts(message_fts, rowid, message_body) VALUES ('delete', old.rowid, old.message_body); "
+    "INSERT INTO message_fts(rowid, message_body) VALUES (new.rowid, new.message_body); END",
+    "INSERT INTO message_fts(message_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS message_fts_insert',
+    'DROP TRIGGER IF EXISTS message_fts_delete',
+    'DROP TRIGGER IF EXISTS message_fts_update',
+    'DROP TABLE IF EXISTS message_fts',
+]
+
+
+def install_message_search(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            # Without FTS5 searches fall back to substring matching
+            if cursor.fetchone()[0]:
+                for statement in SQLITE_INSTALL:
+                    cursor.execute(statement)
+        elif connection.vendor == 'postgresql':
+            config = getattr(settings, 'CHATS_SEARCH_CONFIG', 'english')
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS message_body_search_idx ON message USING GIN "
+                "(to_tsvector(%s::regconfig, COALESCE(message_body, '')))", [config]
+            )
+
+
+def uninstall_message_search(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for statement in SQLITE_UNINSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS message_body_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0005_rate_limit_bucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_message_search, uninstall_message_search),
+    ]
@@ -1,9 +1,13 @@
 # messaging_app/chats/models.py
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Greatest, Substr
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.core.validators import MinLengthValidator
 
+# Characters of the last message shown in conversation lists
+PREVIEW_LENGTH = 50
+
 class UserManager(BaseUserManager):
     def create_user(self, email, first_name, last_name, password=None, **extra_fields):
         if not email:
@@ -25,6 +29,11 @@ class UserManager(BaseUserManager):
         extra_fields.setdefault('role', 'admin')
         
         return self.create_user(email, first_name, last_name, password, **extra_fields)
+    
+    def missing_ids(self, user_ids):
+        """The IDs in user_ids without a user, checked with one query"""
+        found = set(self.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        return [user_id for user_id in user_ids if user_id not in found]
 
 class User(AbstractBaseUser, PermissionsMixin):
     ROLE_CHOICES = [
@@ -59,21 +68,111 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
+class ConversationQuerySet(models.QuerySet):
+    def with_summary(self):
+        """Annotate participant_count, last_message_body and updated_at."""
+        participants = self.model.participants.through.objects.filter(
+            conversation_id=models.OuterRef('pk')
+        ).order_by().values('conversation_id').annotate(total=models.Count('pk')).values('total')
+        return self.annotate(
+            participant_count=Coalesce(models.Subquery(participants), 0),
+            last_message_body=Substr('last_message__message_body', 1, PREVIEW_LENGTH + 1),
+            updated_at=Coalesce('last_message_at', 'created_at'),
+        )
+    
+    def record_messages(self, count, last_message):
+        """Count count new messages and make last_message the last one unless a newer one exists."""
+        self.update(message_count=models.F('message_count') + count)
+        self.filter(
+            models.Q(last_message_at__isnull=True) | models.Q(last_message_at__lte=last_message.sent_at)
+        ).update(last_message=last_message, last_message_at=last_message.sent_at)
+    
+    def forget_messages(self, count):
+        """Uncount count deleted messages and fall back to the previous last message where it was deleted."""
+        self.update(message_count=Greatest(models.F('message_count') - count, 0))
+        # Deleting the last message has already nulled last_message (SET_NULL)
+        latest = Message.objects.filter(conversation_id=models.OuterRef('pk')).order_by('-sent_at', '-message_id')[:1]
+        self.filter(last_message__isnull=True, last_message_at__isnull=False).update(
+            last_message=models.Subquery(latest.values('message_id')),
+            last_message_at=models.Subquery(latest.values('sent_at')),
+        )
+    
+    def rebuild_stats(self):
+        """Recompute the denormalized message fields from the message table."""
+        messages = Message.objects.filter(conversation_id=models.OuterRef('pk'))
+        last_message = messages.order_by('-sent_at', '-message_id')[:1]
+        count = messages.order_by().values('conversation_id').annotate(total=models.Count('pk')).values('total')
+        return self.update(
+            last_message=models.Subquery(last_message.values('message_id')),
+            last_message_at=models.Subquery(last_message.values('sent_at')),
+            message_count=Coalesce(models.Subquery(count), 0),
+        )
+    
+    def with_unread_count(self, user):
+        """Annotate unread_count: messages from others since user last read the conversation."""
+        reads = ConversationRead.objects.filter(conversation_id=models.OuterRef(models.OuterRef('pk')), user=user)
+        unread = Message.objects.filter(conversation_id=models.OuterRef('pk')).exclude(sender=user).filter(
+            models.Q(sent_at__gt=models.Subquery(reads.values('last_read_at')[:1])) | ~models.Exists(reads)
+        ).order_by().values('conversation_id').annotate(total=models.Count('pk')).values('total')
+        return self.annotate(unread_count=Coalesce(models.Subquery(unread), 0))
+
 class Conversation(models.Model):
     conversation_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
     participants = models.ManyToManyField(User, related_name='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Denormalized from messages by chats.signals and the Message delete
+    # methods; rebuild_conversation_stats repairs them
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    message_count = models.PositiveIntegerField(default=0)
+    
+    objects = ConversationQuerySet.as_manager()
+    
     class Meta:
         db_table = 'conversation'
         verbose_name = 'Conversation'
         verbose_name_plural = 'Conversations'
         ordering = ['-created_at']
+        indexes = [
+            # Inbox ordering by activity
+            models.Index(fields=['-last_message_at'], name='conversation_activity_idx'),
+        ]
     
     def __str__(self):
         participant_names = [f"{user.first_name} {user.last_name}" for user in self.participants.all()]
         return f"Conversation between {', '.join(participant_names)}"
 
+class MessageQuerySet(models.QuerySet):
+    def bulk_send(self, messages, batch_size=500):
+        """
+        Insert messages with bulk_create in batches and update the
+        conversation counters that chats.signals would have, all in one
+        transaction. Returns the saved messages.
+        """
+        messages = list(messages)
+        latest = {}
+        for message in messages:
+            latest.setdefault(message.conversation_id, []).append(message)
+        with transaction.atomic():
+            self.bulk_create(messages, batch_size=batch_size)
+            for conversation_id, sent in latest.items():
+                Conversation.objects.filter(pk=conversation_id).record_messages(len(sent), sent[-1])
+        return messages
+    
+    def delete(self):
+        """Delete the messages and uncount them from their conversations."""
+        with transaction.atomic():
+            counts = self.order_by().values('conversation_id').annotate(total=models.Count('pk'))
+            counts = {row['conversation_id']: row['total'] for row in counts}
+            result = super().delete()
+            for conversation_id, total in counts.items():
+                Conversation.objects.filter(pk=conversation_id).forget_messages(total)
+        return result
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+
 class Message(models.Model):
     message_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
@@ -81,11 +180,51 @@ class Message(models.Model):
     message_body = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
     
+    objects = MessageQuerySet.as_manager()
+    
     class Meta:
         db_table = 'message'
         verbose_name = 'Message'
         verbose_name_plural = 'Messages'
         ordering = ['sent_at']
+        indexes = [
+            # Keyset pagination scans a conversation by (sent_at, message_id)
+            models.Index(fields=['conversation', 'sent_at', 'message_id'], name='message_conv_sent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Message from {self.sender.first_name} at {self.sent_at}"
+    
+    def delete(self, *args, **kwargs):
+        # Not a post_delete receiver: any would turn off fast deletes of
+        # the messages cascading from a conversation or user
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Conversation.objects.filter(pk=self.conversation_id).forget_messages(1)
+        return result
+
+class ConversationRead(models.Model):
+    """When a user last read a conversation, for unread counts"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='reads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_reads')
+    last_read_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'conversation_read'
+        unique_together = [('conversation', 'user')]
+    
+    def __str__(self):
+        return f"{self.user} read {self.conversation_id} at {self.last_read_at}"
+
+
+class RateLimitBucket(models.Model):
+    """A token bucket of chats.ratelimit.DatabaseBucketStore"""
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField(help_text="Unix time of the last debit")
+    
+    class Meta:
+        db_table = 'rate_limit_bucket'
     
     def __str__(self):
-        return f"Message from {self.sender.first_name} at {self.sent_at}"
\ No newline at end of file
+        return f"{self.key}: {self.tokens:.2f} tokens"
@@ -1,6 +1,14 @@
 # chats/pagination.py
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class MessagePagination(PageNumberPagination):
     page_size = 20
@@ -32,4 +40,122 @@ class ConversationPagination(PageNumberPagination):
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
             'results': data
-        })
\ No newline at end of file
+        })
+
+class MessageKeysetPagination(BasePagination):
+    """
+    Opt-in cursor pagination for messages, keyed on (sent_at, message_id).
+
+    Each page is a range scan starting after the last row of the previous
+    page, so deep pages cost the same as the first one and no COUNT(*)
+    query is issued. Enabled with ?pagination=cursor (or any ?cursor=).
+    """
+    page_size = MessagePagination.page_size
+    page_size_query_param = MessagePagination.page_size_query_param
+    max_page_size = MessagePagination.max_page_size
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, descending=False):
+        self.descending = descending
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @classmethod
+    def requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, message, reverse):
+        payload = json.dumps({
+            's': message.sent_at.isoformat(),
+            'm': str(message.message_id),
+            'r': reverse,
+        }, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return (
+                datetime.fromisoformat(payload['s']),
+                uuid.UUID(payload['m']),
+                bool(payload['r']),
+            )
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[2]
+
+        # Walking backwards flips the scan direction; rows are put back
+        # in display order below.
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(prefix + 'sent_at', prefix + 'message_id')
+        if cursor is not None:
+            sent_at, message_id, _ = cursor
+            op = 'lt' if descending else 'gt'
+            # The redundant sent_at bound lets the database seek the
+            # (conversation, sent_at, message_id) index instead of
+            # filtering the whole conversation through the OR.
+            queryset = queryset.filter(
+                Q(**{'sent_at__' + op + 'e': sent_at}),
+                Q(**{'sent_at__' + op: sent_at}) | Q(**{'message_id__' + op: message_id}),
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = cursor is not None, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.page_size_used = page_size
+        self.next_cursor = self.encode_cursor(rows[-1], False) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], True) if rows and has_previous else None
+        return rows
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.mode_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'page_size': self.page_size_used,
+            'results': data
+        })
+
+def get_message_paginator(request, descending=False):
+    """Keyset paginator when the client asks for cursor mode, page numbers otherwise."""
+    if MessageKeysetPagination.requested(request):
+        return MessageKeysetPagination(descending=descending)
+    return MessagePagination()
\ No newline at end of file
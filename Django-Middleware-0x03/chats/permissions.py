@@ -2,6 +2,7 @@
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework import status
+from .membership import is_participant
 
 class IsAuthenticated(permissions.BasePermission):
     """
@@ -34,9 +35,9 @@ class IsParticipantOfConversation(permissions.BasePermission):
         
         # Check if the user is a participant in the conversation
         if hasattr(obj, 'participants'):
-            return request.user in obj.participants.all()
-        elif hasattr(obj, 'conversation'):
-            return request.user in obj.conversation.participants.all()
+            return is_participant(request, obj)
+        elif hasattr(obj, 'conversation_id'):
+            return is_participant(request, obj.conversation_id)
         
         return False
 
@@ -58,20 +59,20 @@ class IsMessageOwnerOrParticipant(permissions.BasePermission):
         
         # Allow safe methods (GET, HEAD, OPTIONS) for participants
         if request.method in permissions.SAFE_METHODS:
-            if hasattr(obj, 'conversation'):
-                return request.user in obj.conversation.participants.all()
+            if hasattr(obj, 'conversation_id'):
+                return is_participant(request, obj.conversation_id)
         
         # Allow PUT, PATCH, DELETE only for message owner
         if request.method in ['PUT', 'PATCH', 'DELETE']:
-            return obj.sender == request.user
+            return obj.sender_id == request.user.pk
         
         # Allow POST for participants (sending messages)
         if request.method == 'POST':
-            if hasattr(obj, 'conversation'):
-                return request.user in obj.conversation.participants.all()
+            if hasattr(obj, 'conversation_id'):
+                return is_participant(request, obj.conversation_id)
         
         # Allow if user is the sender of the message
-        if obj.sender == request.user:
+        if obj.sender_id == request.user.pk:
             return True
         
         return False
@@ -0,0 +1,215 @@
+# chats/ratelimit.py
+"""
+Request rate limiting.
+
+SlidingWindowLimiter backs RateLimitMiddleware; TokenBucketLimiter backs
+the per-user throttles of the message endpoints (chats.throttling).
+
+For the sliding window, each key keeps the hit counts of the current
+and the previous fixed window; the rate is estimated by weighting the
+previous count by how much of it still overlaps the sliding window.
+That is O(1) time and memory per key, unlike keeping a log of
+timestamps. MemoryStore keeps counters in the process; CacheStore keeps
+them in the Django cache so every worker shares them.
+
+Token buckets are kept in process memory, a shared Django cache or a
+database table, each updated atomically.
+"""
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest, Least
+
+from .models import RateLimitBucket
+
+
+class MemoryStore:
+    """Window counters in a dict; stale keys are purged as it grows"""
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, now):
+        """Count a hit; returns (previous window count, current window count)"""
+        index = int(now // window)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < index - 1:
+                counter = [index, 0, 0]
+            elif counter[0] == index - 1:
+                counter = [index, counter[2], 0]
+            counter[2] += 1
+            self._counters[key] = counter
+            if len(self._counters) > self.max_keys:
+                self._purge(index)
+            return counter[1], counter[2]
+
+    def _purge(self, index):
+        for key in [key for key, counter in self._counters.items() if counter[0] < index - 1]:
+            del self._counters[key]
+
+
+class CacheStore:
+    """Window counters in a Django cache, shared across workers"""
+    def __init__(self, alias='default', prefix='chats:ratelimit'):
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        current = f'{self.prefix}:{key}:{index}'
+        previous = f'{self.prefix}:{key}:{index - 1}'
+        # add() is a no-op when the key exists, so concurrent first hits
+        # both end up incrementing the same counter
+        self.cache.add(current, 0, int(window * 2) + 1)
+        try:
+            count = self.cache.incr(current)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(current, 1, int(window * 2) + 1)
+            count = 1
+        return self.cache.get(previous, 0), count
+
+
+class SlidingWindowLimiter:
+    """Allow at most limit hits per key in any window seconds"""
+    def __init__(self, limit, window, store=None, clock=time.time):
+        self.limit = limit
+        self.window = window
+        self.store = MemoryStore() if store is None else store
+        self.clock = clock
+
+    def hit(self, key):
+        """Count a hit for key; returns (allowed, seconds until a retry may succeed)"""
+        now = self.clock()
+        previous, current = self.store.hit(key, self.window, now)
+        elapsed = (now % self.window) / self.window
+        estimate = previous * (1 - elapsed) + current
+        if estimate <= self.limit:
+            return True, 0
+        return False, self.window - now % self.window
+
+
+class MemoryBucketStore:
+    """Token buckets in the process, for tests and single-worker setups"""
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, capacity, now):
+        """Take cost tokens if available; returns the tokens left (negative: the shortfall)"""
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(now - stamp, 0) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+            return tokens - cost
+
+
+class CacheBucketStore:
+    """
+    Token buckets in a shared Django cache, kept as a generic cell rate
+    algorithm with the atomic cache.add() and cache.incr(): each key
+    holds the time, in nanoseconds, at which its bucket will be full
+    again. Taking tokens pushes that time forward and a request passes
+    while it stays within one full bucket of now; a denied request
+    gives its increment back. Racing requests can only push the time
+    further than needed, so workers may undersell but never oversell.
+    """
+    def __init__(self, alias='default', prefix='chats:bucket'):
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def take(self, key, cost, rate, capacity, now):
+        key = f'{self.prefix}:{key}'
+        now = int(now * 1e9)
+        interval = 1e9 / rate
+        step = max(int(cost * interval), 1)
+        if self.cache.add(key, now + step, int(capacity / rate) + 1):
+            return capacity - cost
+        try:
+            full_at = self.cache.incr(key, step)
+            if full_at - step < now:
+                # Refilled while idle: start from now, not from the past
+                full_at = self.cache.incr(key, now - (full_at - step))
+        except ValueError:
+            # Expired, so full, since add(); count this one as the first take
+            self.cache.add(key, now + step, int(capacity / rate) + 1)
+            return capacity - cost
+        left = capacity - (full_at - now) / interval
+        if left < 0:
+            try:
+                self.cache.decr(key, step)
+            except ValueError:
+                pass
+            return left
+        self.cache.touch(key, int((full_at - now) / 1e9) + 1)
+        return left
+
+
+class DatabaseBucketStore:
+    """
+    Token buckets in the RateLimitBucket table, refilled and debited by a
+    single conditional UPDATE so concurrent workers never oversell. Works
+    on SQLite as a stand-in for a shared cache.
+    """
+    def take(self, key, cost, rate, capacity, now):
+        elapsed = Greatest(Value(now) - F('updated_at'), Value(0.0))
+        refilled = Least(Value(float(capacity)), F('tokens') + elapsed * Value(rate), output_field=FloatField())
+        for _ in range(2):
+            updated = RateLimitBucket.objects.filter(key=key).alias(refilled=refilled).filter(
+                refilled__gte=cost
+            ).update(tokens=refilled - Value(float(cost)), updated_at=now)
+            if updated:
+                # Tokens left are only needed for a denial's retry time
+                return 0
+            bucket = RateLimitBucket.objects.filter(key=key).first()
+            if bucket is not None:
+                left = min(capacity, bucket.tokens + max(now - bucket.updated_at, 0) * rate) - cost
+                if left < 0:
+                    return left
+                # Refilled since the UPDATE; try again
+                continue
+            try:
+                with transaction.atomic():
+                    RateLimitBucket.objects.create(key=key, tokens=capacity - cost, updated_at=now)
+                return capacity - cost
+            except IntegrityError:
+                # Another worker created it first; debit that one
+                continue
+        # Lost every race; deny, as retrying without a bound could spin
+        return -cost
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets holding up to capacity tokens and refilled at rate
+    tokens per second; each request takes cost tokens.
+    """
+    def __init__(self, rate, capacity, store=None, clock=time.time):
+        self.rate = rate
+        self.capacity = capacity
+        self.store = MemoryBucketStore() if store is None else store
+        self.clock = clock
+
+    def take(self, key, cost=1):
+        """Take cost tokens from key's bucket; returns (allowed, seconds until they would be available)"""
+        if cost > self.capacity:
+            return False, None
+        left = self.store.take(key, cost, self.rate, self.capacity, self.clock())
+        if left >= 0:
+            return True, 0
+        return False, -left / self.rate
+
+
+def get_bucket_store(backend):
+    """Store for a CHATS_TOKEN_BUCKET 'backend' name"""
+    stores = {'memory': MemoryBucketStore, 'cache': CacheBucketStore, 'database': DatabaseBucketStore}
+    try:
+        return stores[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown token bucket backend {backend!r}, expected one of {', '.join(stores)}")
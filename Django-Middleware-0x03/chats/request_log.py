@@ -0,0 +1,194 @@
+# chats/request_log.py
+"""
+Buffered, rotating log writer used by RequestLoggingMiddleware.
+
+Requests only put a line on a bounded queue; a background thread
+drains it and appends whole batches to the file, flushing at least
+every flush_interval seconds. The file is rotated to path.1, path.2, ...
+once it grows past max_bytes or has been open for rotate_interval
+seconds. When the queue is full, lines are dropped (counted in
+``dropped``) or, with policy='block', the request waits up to
+block_timeout seconds for room.
+
+A batch that cannot be written (missing directory, full disk) is
+dropped and reported through logging; the file is reopened for the
+next batch, so the writer recovers once the problem is fixed.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BufferedLogWriter:
+    def __init__(self, path, max_queue=10000, batch_size=512, flush_interval=1.0,
+                 max_bytes=10 * 1024 * 1024, backup_count=5, rotate_interval=None,
+                 policy='drop', block_timeout=0.1):
+        if policy not in ('drop', 'block'):
+            raise ValueError("policy must be 'drop' or 'block'")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_interval = rotate_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._failing = False
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(); each worker process starts its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(self._queue.maxsize)
+                    self._thread = threading.Thread(target=self._run, name='request-log-writer', daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def write(self, line):
+        """Queue a line for writing; never blocks longer than block_timeout"""
+        self._ensure_thread()
+        try:
+            if self.policy == 'block':
+                self._queue.put(line, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until every queued line has been written; returns whether they were"""
+        if self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Write what is queued and stop the writer thread"""
+        if self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning('Request log writer for %s did not drain before closing', self.path)
+        else:
+            self._thread.join(timeout)
+        self._pid = None
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+        self._opened_at = time.monotonic()
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for number in range(self.backup_count - 1, 0, -1):
+                source = f'{self.path}.{number}'
+                if os.path.exists(source):
+                    os.replace(source, f'{self.path}.{number + 1}')
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and time.monotonic() - self._opened_at >= self.rotate_interval
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _write_batch(self, batch):
+        if self._file is None:
+            self._open()
+        data = ''.join(batch)
+        self._file.write(data)
+        self._file.flush()
+        # Bytes, as tell() counts them in _open()
+        self._size += len(data.encode('utf-8'))
+        if self._should_rotate():
+            self._rotate()
+
+    def _write(self, batch):
+        # Never let an error kill the thread, or every later line is lost
+        try:
+            self._write_batch(batch)
+        except Exception:
+            self.dropped += len(batch)
+            if not self._failing:
+                logger.exception('Cannot write request log %s; dropping lines until it recovers', self.path)
+            self._failing = True
+            self._close_file()
+        else:
+            if self._failing:
+                logger.warning('Request log %s is writable again', self.path)
+            self._failing = False
+
+    def _run(self):
+        batch, waiters = [], []
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None:
+                batch.append(item)
+            now = time.monotonic()
+            if batch and (len(batch) >= self.batch_size or now >= deadline or waiters or stopping):
+                self._write(batch)
+                batch = []
+            if now >= deadline:
+                deadline = now + self.flush_interval
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+        self._close_file()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path, **options):
+    """The shared writer for path, created with options on first use"""
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = BufferedLogWriter(path, **options)
+        return writer
+
+
+@atexit.register
+def _close_writers():
+    for writer in list(_writers.values()):
+        writer.close()
@@ -0,0 +1,262 @@
+# chats/search.py
+"""
+Full-text search over message bodies.
+
+A search backend filters a Message queryset to the messages matching a
+query, annotates each with a search_rank (higher is better) and orders
+by it. The backend is chosen by CHATS_SEARCH_BACKEND (a dotted path) or,
+by default, from the database vendor:
+
+- SQLite: an FTS5 table (message_fts) indexing the message table,
+  kept in sync by triggers on insert, update and delete, so bulk
+  inserts and queryset updates are indexed too. Ranked by bm25.
+- PostgreSQL: a GIN index on the tsvector of message_body, ranked by
+  ts_rank.
+- Anything else: a case-insensitive substring match, unranked.
+
+Other engines plug in as SearchBackend subclasses overriding filter()
+and the index methods.
+
+The index is created by migration 0006 and restored after every migrate
+if a migration rebuilt the message table, which on SQLite drops the
+triggers and renumbers rows. VACUUM may renumber rows too; run the
+rebuild_message_search command after it.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Value
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Message
+
+RANK = 'search_rank'
+
+# The migration creating the index
+SEARCH_MIGRATION = ('chats', '0006_message_search')
+
+WORD_RE = re.compile(r'\w+')
+
+
+class SearchBackend:
+    """Case-insensitive substring search; the fallback without a full-text index"""
+    def __init__(self, using='default'):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    @classmethod
+    def is_supported(cls, connection):
+        """Whether install can work on connection"""
+        return True
+
+    @classmethod
+    def is_available(cls, connection):
+        """Whether the index is installed on connection"""
+        return True
+
+    def install(self):
+        """Create and fill the index and whatever keeps it in sync, if missing"""
+
+    def uninstall(self):
+        """Drop what install created"""
+
+    def rebuild(self):
+        """Recreate whatever is missing and reindex every message"""
+
+    def filter(self, queryset, query):
+        """Messages of queryset matching query, annotated with search_rank"""
+        return queryset.filter(message_body__icontains=query).annotate(**{RANK: Value(0.0)})
+
+    def search(self, queryset, query):
+        """Messages of queryset matching query, best first"""
+        if RANK in queryset.query.annotations or RANK in queryset.query.extra:
+            # Already searched, by SearchFilter and MessageFilter sharing ?search=
+            return queryset
+        return self.filter(queryset, query).order_by(f'-{RANK}', 'sent_at', 'message_id')
+
+
+class SQLiteFTS5SearchBackend(SearchBackend):
+    """SQLite FTS5 index of message bodies, with prefix matching of every query word"""
+    table = 'message_fts'
+
+    @classmethod
+    def is_supported(cls, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            return bool(cursor.fetchone()[0])
+
+    @classmethod
+    def objects(cls):
+        """Names of the index table and of the triggers keeping it in sync"""
+        return [cls.table] + [f'{cls.table}_{trigger}' for trigger in ('insert', 'delete', 'update')]
+
+    @classmethod
+    def is_available(cls, connection):
+        # Rebuilding the message table drops the triggers but not the index
+        with connection.cursor() as cursor:
+            names = cls.objects()
+            cursor.execute(
+                f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+            )
+            return cursor.fetchone()[0] == len(names)
+
+    def install(self):
+        if self.is_available(self.connection):
+            return
+        self.rebuild()
+
+    def rebuild(self):
+        # Also restores triggers dropped with a rebuilt message table
+        index, content = self.table, Message._meta.db_table
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+            f"message_body, content='{content}', tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {content} BEGIN "
+            f"INSERT INTO {index}(rowid, message_body) VALUES (new.rowid, new.message_body); END",
+            f"CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {content} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, message_body) VALUES ('delete', old.rowid, old.message_body); END",
+            f"CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF message_body ON {content} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, message_body) VALUES ('delete', old.rowid, old.message_body); "
+            f"INSERT INTO {index}(rowid, message_body) VALUES (new.rowid, new.message_body); END",
+        ]
+        with self.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            # Rows may have been renumbered or missed while the triggers were gone
+            cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {index}({index}) VALUES ('optimize')")
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {self.table}_{trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    @staticmethod
+    def match_expression(query):
+        """FTS5 query matching every word of query as a prefix; None without words"""
+        words = WORD_RE.findall(query)
+        return ' '.join(f'"{word}"*' for word in words) if words else None
+
+    def filter(self, queryset, query):
+        match = self.match_expression(query)
+        if match is None:
+            return queryset.none().annotate(**{RANK: Value(0.0)})
+        # A join driven by the index, which also supplies the rank; the
+        # ORM has no way to express one against a virtual table
+        index, content = self.table, Message._meta.db_table
+        return queryset.extra(
+            select={RANK: f'-{index}.rank'},
+            tables=[index],
+            where=[f'{index}.rowid = {content}.rowid', f'{index} MATCH %s'],
+            params=[match],
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """PostgreSQL full-text search on an expression index of message_body"""
+    index = 'message_body_search_idx'
+
+    @classmethod
+    def is_available(cls, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [cls.index])
+            return cursor.fetchone() is not None
+
+    @property
+    def config(self):
+        return getattr(settings, 'CHATS_SEARCH_CONFIG', 'english')
+
+    def install(self):
+        if not re.fullmatch(r'\w+', self.config):
+            raise ImproperlyConfigured(f'Invalid CHATS_SEARCH_CONFIG: {self.config!r}')
+        # Must match the SQL of SearchVector for the index to be used
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.index} ON {Message._meta.db_table} USING GIN "
+                f"(to_tsvector('{self.config}'::regconfig, COALESCE(message_body, '')))"
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {self.index}')
+
+    def rebuild(self):
+        self.install()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {self.index}')
+
+    def filter(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector('message_body', config=self.config)
+        search_query = SearchQuery(query, config=self.config, search_type='websearch')
+        return queryset.annotate(search_vector=vector).filter(search_vector=search_query).annotate(
+            **{RANK: SearchRank(vector, search_query)}
+        )
+
+
+def backend_class(connection):
+    """The search backend class configured for connection"""
+    path = getattr(settings, 'CHATS_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)
+    return {
+        'sqlite': SQLiteFTS5SearchBackend,
+        'postgresql': PostgresSearchBackend,
+    }.get(connection.vendor, SearchBackend)
+
+
+_backends = {}
+
+
+def get_search_backend(using='default'):
+    """
+    The search backend of a database connection. Falls back to substring
+    search while the full-text index is missing, e.g. on SQLite builds
+    without FTS5.
+    """
+    backend = _backends.get(using)
+    if backend is None:
+        connection = connections[using]
+        cls = backend_class(connection)
+        if not cls.is_available(connection):
+            cls = SearchBackend
+        backend = _backends[using] = cls(using)
+    return backend
+
+
+def install_search_index(sender, using='default', **kwargs):
+    """
+    post_migrate handler restoring the index, and on SQLite its triggers,
+    after migrations that rebuilt the message table. Does nothing while
+    migration 0006 is not applied, e.g. after migrating to an earlier one.
+    """
+    _backends.pop(using, None)
+    connection = connections[using]
+    if Message._meta.db_table not in connection.introspection.table_names():
+        return
+    if SEARCH_MIGRATION not in MigrationRecorder(connection).applied_migrations():
+        return
+    cls = backend_class(connection)
+    if cls.is_supported(connection) and not cls.is_available(connection):
+        cls(using).install()
+
+
+def search_messages(queryset, query):
+    """Messages of queryset matching query, best first"""
+    return get_search_backend(queryset.db).search(queryset, query)
+
+
+@receiver(setting_changed)
+def reset_search_backends(setting, **kwargs):
+    if setting in ('CHATS_SEARCH_BACKEND', 'DATABASES'):
+        _backends.clear()
@@ -1,11 +1,47 @@
 # messaging_app/chats/serializers.py
 from rest_framework import serializers
+from django.db import transaction
 from django.contrib.auth import get_user_model
-from .models import Conversation, Message
+from .content_filter import get_content_filter
+from .models import PREVIEW_LENGTH, Conversation, Message
+from .throttling import BulkMessageSendThrottle
 
 # Use Django's get_user_model to work with custom user model
 User = get_user_model()
 
+def message_preview(body):
+    if body is None:
+        return "No messages yet"
+    if len(body) > PREVIEW_LENGTH:
+        return body[:PREVIEW_LENGTH] + "..."
+    return body
+
+def no_offensive_language(value):
+    """Validator rejecting message bodies that contain an offensive term"""
+    content_filter = get_content_filter()
+    if content_filter is not None and content_filter.find(value) is not None:
+        raise serializers.ValidationError("Message contains offensive language")
+
+def _is_prefetched(obj, name):
+    return name in getattr(obj, '_prefetched_objects_cache', {})
+
+def last_message_of(conversation):
+    """
+    Last message of a conversation: taken from prefetched messages when
+    available, else loaded once through the denormalized last_message
+    field. The result is kept on the instance.
+    """
+    if not hasattr(conversation, '_last_message'):
+        if _is_prefetched(conversation, 'messages'):
+            messages = conversation.messages.all()
+            last_message = messages[len(messages) - 1] if messages else None
+        elif conversation.last_message_id is not None:
+            last_message = Message.objects.select_related('sender').get(pk=conversation.last_message_id)
+        else:
+            last_message = None
+        conversation._last_message = last_message
+    return conversation._last_message
+
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     
@@ -26,6 +62,7 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = ['message_id', 'sender', 'sender_id', 'conversation', 'conversation_id', 'message_body', 'sent_at']
         read_only_fields = ['message_id', 'sender', 'sent_at']
+        extra_kwargs = {'message_body': {'validators': [no_offensive_language]}}
     
     def create(self, validated_data):
         sender_id = validated_data.pop('sender_id', None)
@@ -74,28 +111,59 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['conversation_id', 'participants', 'messages', 'created_at']
     
     def get_participant_count(self, obj):
+        if hasattr(obj, 'participant_count'):
+            return obj.participant_count
         return obj.participants.count()
     
     def get_last_message(self, obj):
-        last_message = obj.messages.last()
+        last_message = last_message_of(obj)
         if last_message:
             return MessageSerializer(last_message).data
         return None
     
     def create(self, validated_data):
-        participant_ids = validated_data.pop('participant_ids')
-        conversation = Conversation.objects.create(**validated_data)
+        participant_ids = list(dict.fromkeys(validated_data.pop('participant_ids')))
+        missing_ids = User.objects.missing_ids(participant_ids)
+        if missing_ids:
+            raise serializers.ValidationError(
+                f"Users with IDs {', '.join(map(str, missing_ids))} do not exist"
+            )
         
-        # Add participants to the conversation
-        for user_id in participant_ids:
-            try:
-                user = User.objects.get(user_id=user_id)
-                conversation.participants.add(user)
-            except User.DoesNotExist:
-                raise serializers.ValidationError(f"User with ID {user_id} does not exist")
+        with transaction.atomic():
+            conversation = Conversation.objects.create(**validated_data)
+            # Add all participants with a single bulk insert
+            conversation.participants.add(*participant_ids)
         
         return conversation
 
+class ConversationListSerializer(serializers.ModelSerializer):
+    """
+    Summary used by conversation lists. Every field but participants comes
+    from ConversationQuerySet annotations, so history size does not affect
+    the payload; full messages are served by retrieve and the messages action.
+    """
+    participants = UserSerializer(many=True, read_only=True)
+    participant_count = serializers.IntegerField(read_only=True)
+    last_message_preview = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True)
+    updated_at = serializers.DateTimeField(read_only=True)
+    
+    class Meta:
+        model = Conversation
+        fields = [
+            'conversation_id',
+            'participants',
+            'participant_count',
+            'last_message_preview',
+            'unread_count',
+            'updated_at',
+            'created_at'
+        ]
+        read_only_fields = fields
+    
+    def get_last_message_preview(self, obj):
+        return message_preview(obj.last_message_body)
+
 class ConversationCreateSerializer(serializers.ModelSerializer):
     participant_ids = serializers.ListField(
         child=serializers.UUIDField(),
@@ -125,11 +193,14 @@ class ConversationDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['conversation_id', 'participants', 'messages', 'created_at']
     
     def get_messages(self, obj):
-        messages = obj.messages.all().order_by('sent_at')
+        if _is_prefetched(obj, 'messages'):
+            messages = obj.messages.all()
+        else:
+            messages = obj.messages.select_related('sender').order_by('sent_at', 'message_id')
         return MessageSerializer(messages, many=True).data
     
     def get_message_count(self, obj):
-        return obj.messages.count()
+        return obj.message_count
 
 class MessageCreateSerializer(serializers.ModelSerializer):
     sender_id = serializers.UUIDField(write_only=True)
@@ -137,6 +208,7 @@ class MessageCreateSerializer(serializers.ModelSerializer):
     message_body = serializers.CharField(
         max_length=1000,
         required=True,
+        validators=[no_offensive_language],
         help_text="The content of the message"
     )
     
@@ -168,16 +240,37 @@ class MessageCreateSerializer(serializers.ModelSerializer):
             message_body=validated_data['message_body']
         )
 
+class BulkMessageItemSerializer(serializers.Serializer):
+    conversation_id = serializers.UUIDField(required=False)
+    message_body = serializers.CharField(max_length=1000, validators=[no_offensive_language])
+
+class BulkMessageSerializer(serializers.Serializer):
+    """A batch of messages sent by the requesting user"""
+    MAX_MESSAGES = 1000
+    
+    messages = serializers.ListField(
+        child=BulkMessageItemSerializer(),
+        min_length=1,
+        max_length=MAX_MESSAGES,
+        help_text="Messages to send, in order"
+    )
+    
+    @classmethod
+    def max_messages(cls):
+        """The most messages one request may carry, within the send throttle's bucket"""
+        return min(cls.MAX_MESSAGES, int(BulkMessageSendThrottle.get_limiter().capacity))
+    
+    def validate_messages(self, messages):
+        limit = self.max_messages()
+        if len(messages) > limit:
+            raise serializers.ValidationError(f"Send at most {limit} messages per request")
+        return messages
+
 # Add a method to the Conversation model to get last message preview
 # Add this to your models.py or here as a mixin
 def get_last_message_preview(self):
-    last_message = self.messages.last()
-    if last_message:
-        preview = last_message.message_body[:50]
-        if len(last_message.message_body) > 50:
-            preview += "..."
-        return preview
-    return "No messages yet"
+    last_message = last_message_of(self)
+    return message_preview(last_message.message_body if last_message else None)
 
 # Add this method to the Conversation model
 # You can either add it directly to models.py or use this approach
@@ -0,0 +1,61 @@
+# chats/signals.py
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .auth import invalidate_user
+from .membership import Participant, invalidate_membership
+from .models import Conversation, Message, User
+
+
+@receiver(post_save, sender=Message)
+def record_new_message(sender, instance, created, **kwargs):
+    """Count a new message and make it the last one unless a newer one exists"""
+    if not created:
+        return
+    Conversation.objects.filter(pk=instance.conversation_id).record_messages(1, instance)
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the cached conversation sets of users joining or leaving"""
+    if action in ('post_add', 'post_remove'):
+        # Forward changes list the users, reverse ones come from the user
+        invalidate_membership([instance.pk] if reverse else pk_set)
+    elif action == 'pre_clear':
+        # The cleared side is only known before the rows go
+        if reverse:
+            invalidate_membership([instance.pk])
+        else:
+            invalidate_membership(
+                Participant.objects.filter(conversation_id=instance.pk).values_list('user_id', flat=True)
+            )
+
+
+@receiver(pre_delete, sender=Conversation)
+def conversation_deleted(sender, instance, **kwargs):
+    """Participant rows cascade without m2m_changed, so invalidate here"""
+    invalidate_membership(
+        Participant.objects.filter(conversation_id=instance.pk).values_list('user_id', flat=True)
+    )
+
+
+@receiver(pre_delete, sender=User)
+def count_messages_of_deleted_user(sender, instance, **kwargs):
+    """Note how many messages the user's deletion removes from each conversation"""
+    counts = Message.objects.filter(sender=instance).order_by().values('conversation_id').annotate(total=Count('pk'))
+    instance._deleted_message_counts = {row['conversation_id']: row['total'] for row in counts}
+
+
+@receiver(post_delete, sender=User)
+def forget_messages_of_deleted_user(sender, instance, **kwargs):
+    """Uncount the messages that cascaded with the user"""
+    for conversation_id, total in getattr(instance, '_deleted_message_counts', {}).items():
+        Conversation.objects.filter(pk=conversation_id).forget_messages(total)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Stop authenticating with cached copies of a changed or removed user"""
+    invalidate_user(instance.pk)
@@ -1,3 +1,914 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from unittest import mock
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .models import Conversation, Message, RateLimitBucket, User
+from .pagination import MessageKeysetPagination, MessagePagination, get_message_paginator
+from .auth import CustomJWTAuthentication, local_users, user_cache_version
+from .content_filter import ContentFilter, FileContentFilter, get_content_filter
+from .middleware import (
+    OffensiveLanguageMiddleware,
+    RateLimitMiddleware,
+    RestrictAccessByTimeMiddleware,
+    RolePermissionMiddleware,
+)
+from .ratelimit import (
+    CacheBucketStore,
+    DatabaseBucketStore,
+    MemoryBucketStore,
+    MemoryStore,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+)
+from .request_log import BufferedLogWriter
+from .search import (
+    SearchBackend,
+    SQLiteFTS5SearchBackend,
+    get_search_backend,
+    install_search_index,
+    search_messages,
+)
+from .membership import is_participant, member_conversation_ids, membership_cache_key
+from .serializers import BulkMessageSerializer
+from .views import ConversationViewSet, MessageViewSet
+
+
+class ChatsTestCase(TestCase):
+    """Alice, signed up and alone in one conversation"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user('alice@test.com', 'Alice', 'Smith', 'password')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+
+
+class KeysetPaginationTests(ChatsTestCase):
+    def setUp(self):
+        super().setUp()
+        messages = Message.objects.bulk_create(
+            Message(sender=self.user, conversation=self.conversation, message_body=f'message {i}')
+            for i in range(25)
+        )
+        # Pairs of messages share a timestamp so the message_id tie-break matters
+        start = timezone.now()
+        for i, message in enumerate(messages):
+            Message.objects.filter(pk=message.pk).update(sent_at=start + timedelta(seconds=i // 2))
+        self.expected = list(
+            self.conversation.messages.order_by('sent_at', 'message_id').values_list('message_id', flat=True)
+        )
+
+    def request(self, url='/api/messages/', **params):
+        return Request(self.factory.get(url, params))
+
+    def paginate(self, paginator, **params):
+        rows = paginator.paginate_queryset(self.conversation.messages.all(), self.request(**params))
+        return [row.message_id for row in rows], paginator.get_paginated_response([]).data
+
+    def cursor(self, link):
+        return Request(self.factory.get(link)).query_params['cursor']
+
+    def test_walks_every_message_once_in_order(self):
+        seen, params = [], {'pagination': 'cursor', 'page_size': 10}
+        while True:
+            ids, data = self.paginate(MessageKeysetPagination(), **params)
+            seen.extend(ids)
+            if data['next'] is None:
+                break
+            params = {'cursor': self.cursor(data['next']), 'page_size': 10}
+        self.assertEqual(seen, self.expected)
+        self.assertNotIn('count', data)
+
+    def test_previous_link_returns_preceding_page(self):
+        _, first = self.paginate(MessageKeysetPagination(), pagination='cursor', page_size=10)
+        self.assertIsNone(first['previous'])
+        ids, second = self.paginate(MessageKeysetPagination(), cursor=self.cursor(first['next']), page_size=10)
+        self.assertEqual(ids, self.expected[10:20])
+        ids, back = self.paginate(MessageKeysetPagination(), cursor=self.cursor(second['previous']), page_size=10)
+        self.assertEqual(ids, self.expected[:10])
+        self.assertIsNone(back['previous'])
+        self.assertIsNotNone(back['next'])
+
+    def test_descending(self):
+        ids, data = self.paginate(MessageKeysetPagination(descending=True), pagination='cursor', page_size=10)
+        self.assertEqual(ids, self.expected[::-1][:10])
+        ids, _ = self.paginate(MessageKeysetPagination(descending=True), cursor=self.cursor(data['next']), page_size=10)
+        self.assertEqual(ids, self.expected[::-1][10:20])
+
+    def test_single_query_per_page(self):
+        with self.assertNumQueries(1):
+            self.paginate(MessageKeysetPagination(), pagination='cursor')
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginate(MessageKeysetPagination(), cursor='not-a-cursor')
+
+    def test_page_numbers_remain_the_default(self):
+        self.assertIsInstance(get_message_paginator(self.request()), MessagePagination)
+        self.assertIsInstance(get_message_paginator(self.request(pagination='cursor')), MessageKeysetPagination)
+
+
+class ConversationQueryCountTests(ChatsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.others = [
+            User.objects.create_user(f'user{i}@test.com', 'User', str(i), 'password')
+            for i in range(3)
+        ]
+
+    def create_conversations(self, count, messages=3):
+        conversations = []
+        for _ in range(count):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user, *self.others)
+            for i in range(messages):
+                Message.objects.create(
+                    sender=self.others[i % len(self.others)],
+                    conversation=conversation,
+                    message_body=f'message {i}'
+                )
+            conversations.append(conversation)
+        return conversations
+
+    def get(self, actions, **kwargs):
+        request = self.factory.get('/api/conversations/')
+        force_authenticate(request, user=self.user)
+        response = ConversationViewSet.as_view(actions)(request, **kwargs)
+        response.render()
+        return response
+
+    def test_list_query_count_is_constant(self):
+        # count, conversations with their annotations, participants; the
+        # first request after a membership change also loads the membership set;
+        # Alice's empty conversation from setUp makes three, then ten
+        self.create_conversations(2)
+        with self.assertNumQueries(4):
+            self.get({'get': 'list'})
+        with self.assertNumQueries(3):
+            self.get({'get': 'list'})
+        self.create_conversations(7)
+        self.get({'get': 'list'})
+        with self.assertNumQueries(3):
+            response = self.get({'get': 'list'})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_list_values(self):
+        conversation, = self.create_conversations(1)
+        Message.objects.create(sender=self.user, conversation=conversation, message_body='x' * 60)
+        last = conversation.messages.order_by('sent_at', 'message_id').last()
+        result, = [
+            result for result in self.get({'get': 'list'}).data['results']
+            if result['conversation_id'] == str(conversation.pk)
+        ]
+        self.assertEqual(result['participant_count'], 4)
+        self.assertNotIn('messages', result)
+        self.assertEqual(result['last_message_preview'], 'x' * 50 + '...')
+        self.assertEqual(result['updated_at'], last.sent_at.isoformat().replace('+00:00', 'Z'))
+        self.assertEqual(result['unread_count'], 3)
+
+    def test_ordering_by_annotation_outside_list(self):
+        conversation, = self.create_conversations(1)
+        request = self.factory.get('/api/conversations/', {'ordering': 'updated_at'})
+        force_authenticate(request, user=self.user)
+        response = ConversationViewSet.as_view({'get': 'retrieve'})(request, pk=conversation.pk)
+        self.assertEqual(response.status_code, 200)
+        request = self.factory.get('/api/conversations/', {'ordering': '-updated_at'})
+        force_authenticate(request, user=self.user)
+        response = ConversationViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.data['results'][0]['conversation_id'], str(conversation.pk))
+
+    def test_read_resets_unread_count(self):
+        conversation, = self.create_conversations(1)
+        request = self.factory.post('/api/conversations/')
+        force_authenticate(request, user=self.user)
+        response = ConversationViewSet.as_view({'post': 'read'})(request, pk=conversation.pk)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get({'get': 'list'}).data['results'][0]['unread_count'], 0)
+        Message.objects.create(sender=self.others[0], conversation=conversation, message_body='new')
+        self.assertEqual(self.get({'get': 'list'}).data['results'][0]['unread_count'], 1)
+
+    def test_retrieve_query_count(self):
+        conversation, = self.create_conversations(1, messages=10)
+        self.get({'get': 'list'})
+        with self.assertNumQueries(3):
+            response = self.get({'get': 'retrieve'}, pk=conversation.pk)
+        self.assertEqual(response.data['message_count'], 10)
+
+
+class ConversationStatsTests(ChatsTestCase):
+    def send(self, body):
+        return Message.objects.create(sender=self.user, conversation=self.conversation, message_body=body)
+
+    def assertStats(self, last_message, count):
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message, last_message)
+        self.assertEqual(self.conversation.last_message_at, last_message.sent_at if last_message else None)
+        self.assertEqual(self.conversation.message_count, count)
+
+    def test_create_and_delete_maintain_stats(self):
+        self.assertStats(None, 0)
+        first = self.send('first')
+        second = self.send('second')
+        self.assertStats(second, 2)
+        second.delete()
+        self.assertStats(first, 1)
+        first.delete()
+        self.assertStats(None, 0)
+
+    def test_queryset_delete_maintains_stats(self):
+        first = self.send('first')
+        self.send('second')
+        self.send('third')
+        self.conversation.messages.exclude(pk=first.pk).delete()
+        self.assertStats(first, 1)
+
+    def test_deleting_a_user_uncounts_their_messages(self):
+        other = User.objects.create_user('bob@test.com', 'Bob', 'Jones')
+        self.conversation.participants.add(other)
+        first = self.send('first')
+        Message.objects.create(sender=other, conversation=self.conversation, message_body='second')
+        other.delete()
+        self.assertStats(first, 1)
+
+    def test_conversation_delete_query_count_is_constant(self):
+        def deletion_queries(count):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user)
+            Message.objects.bulk_send(
+                Message(sender=self.user, conversation=conversation, message_body=str(i)) for i in range(count)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                conversation.delete()
+            self.assertFalse(Message.objects.filter(conversation_id=conversation.pk).exists())
+            return len(queries)
+
+        self.assertEqual(deletion_queries(5), deletion_queries(50))
+
+    def test_rebuild_command(self):
+        self.send('first')
+        last = self.send('second')
+        Conversation.objects.update(last_message=None, last_message_at=None, message_count=0)
+        out = StringIO()
+        call_command('rebuild_conversation_stats', stdout=out)
+        self.assertIn('Rebuilt 1 conversation(s)', out.getvalue())
+        self.assertStats(last, 2)
+
+
+class MembershipTests(ChatsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user('bob@test.com', 'Bob', 'Jones', 'password')
+        self.conversation.participants.add(self.other)
+        self.foreign = Conversation.objects.create()
+        self.foreign.participants.add(self.other)
+
+    def request(self, user=None):
+        request = Request(self.factory.get('/'))
+        request.user = user or self.user
+        return request
+
+    def test_checks_are_cached_per_request(self):
+        request = self.request()
+        with self.assertNumQueries(2):
+            self.assertTrue(is_participant(request, self.conversation))
+            self.assertTrue(is_participant(request, self.conversation.pk))
+            self.assertFalse(is_participant(request, self.foreign.pk))
+        self.assertTrue(is_participant(self.request(self.other), self.foreign))
+
+    def test_membership_set_answers_checks(self):
+        request = self.request()
+        with self.assertNumQueries(1):
+            self.assertEqual(member_conversation_ids(request), {self.conversation.pk})
+            self.assertTrue(is_participant(request, self.conversation))
+            self.assertFalse(is_participant(request, self.foreign))
+
+    def test_membership_set_is_cached_across_requests(self):
+        self.assertEqual(member_conversation_ids(self.request()), {self.conversation.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(member_conversation_ids(self.request()), {self.conversation.pk})
+            self.assertFalse(is_participant(self.request(), self.foreign))
+
+    def test_participant_changes_invalidate_the_cache(self):
+        member_conversation_ids(self.request())
+        self.foreign.participants.add(self.user)
+        self.assertEqual(member_conversation_ids(self.request()), {self.conversation.pk, self.foreign.pk})
+        self.user.conversations.remove(self.conversation)
+        self.assertEqual(member_conversation_ids(self.request()), {self.foreign.pk})
+        self.foreign.participants.clear()
+        self.assertEqual(member_conversation_ids(self.request()), set())
+
+    def test_cache_refilled_before_commit_is_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.foreign.participants.add(self.user)
+            # A concurrent request still sees the committed, older membership
+            cache.set(membership_cache_key(self.user.pk), {self.conversation.pk})
+        self.assertEqual(member_conversation_ids(self.request()), {self.conversation.pk, self.foreign.pk})
+
+    def test_message_update_checks_membership_once(self):
+        message = Message.objects.create(sender=self.user, conversation=self.conversation, message_body='hi')
+        request = self.factory.patch('/api/messages/', {'message_body': 'edited'}, format='json')
+        force_authenticate(request, user=self.user)
+        # membership set, object lookup (twice: update override and DRF), update
+        with self.assertNumQueries(4):
+            response = MessageViewSet.as_view({'patch': 'partial_update'})(request, pk=message.pk)
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_participant_cannot_read_message(self):
+        message = Message.objects.create(sender=self.other, conversation=self.foreign, message_body='hi')
+        request = self.factory.get('/api/messages/')
+        force_authenticate(request, user=self.user)
+        response = MessageViewSet.as_view({'get': 'retrieve'})(request, pk=message.pk)
+        self.assertEqual(response.status_code, 404)
+
+
+class ConversationCreateTests(ChatsTestCase):
+    def create_users(self, count):
+        return [
+            User.objects.create_user(f'member{i}-{count}@test.com', 'Member', str(i))
+            for i in range(count)
+        ]
+
+    def post(self, participant_ids, **data):
+        request = self.factory.post(
+            '/api/conversations/',
+            {'participant_ids': [str(user_id) for user_id in participant_ids], **data},
+            format='json'
+        )
+        force_authenticate(request, user=self.user)
+        return ConversationViewSet.as_view({'post': 'create'})(request)
+
+    def count_queries(self, participant_ids):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(participant_ids)
+        self.assertEqual(response.status_code, 201)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_group_size(self):
+        small = [user.user_id for user in self.create_users(3)]
+        large = [user.user_id for user in self.create_users(200)]
+        self.assertEqual(self.count_queries(small), self.count_queries(large))
+        conversation = Conversation.objects.filter(participants=large[0]).get()
+        self.assertEqual(conversation.participants.count(), 201)
+
+    def test_reports_every_missing_id(self):
+        members = [user.user_id for user in self.create_users(2)]
+        missing = [uuid.uuid4(), uuid.uuid4()]
+        response = self.post(members + missing)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing_ids'], missing)
+        self.assertFalse(Conversation.objects.exclude(pk=self.conversation.pk).exists())
+
+
+class BulkMessageTests(ChatsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user('bob@test.com', 'Bob', 'Jones', 'password')
+        self.conversation.participants.add(self.other)
+        self.second = Conversation.objects.create()
+        self.second.participants.add(self.user)
+        self.foreign = Conversation.objects.create()
+        self.foreign.participants.add(self.other)
+        # The router passes the @action options, the send throttle among them
+        self.send_messages = ConversationViewSet.as_view(
+            {'post': 'send_messages'}, **ConversationViewSet.send_messages.kwargs
+        )
+        self.bulk = MessageViewSet.as_view({'post': 'bulk'}, **MessageViewSet.bulk.kwargs)
+
+    def post(self, view, data, **kwargs):
+        request = self.factory.post('/api/', data, format='json')
+        force_authenticate(request, user=self.user)
+        return view(request, **kwargs)
+
+    def test_largest_batch_passes_the_shipped_throttle(self):
+        limit = BulkMessageSerializer.max_messages()
+        self.assertEqual(limit, BulkMessageSerializer.MAX_MESSAGES)
+        response = self.post(
+            self.send_messages,
+            {'messages': [{'message_body': f'message {i}'} for i in range(limit)]},
+            pk=self.conversation.pk
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.conversation.messages.count(), limit)
+        response = self.post(self.bulk, {'messages': [
+            {'conversation_id': str(self.second.pk), 'message_body': f'message {i}'} for i in range(limit)
+        ]})
+        self.assertEqual(response.status_code, 201)
+
+    def test_send_messages_to_conversation(self):
+        bodies = [f'message {i}' for i in range(30)]
+        response = self.post(
+            self.send_messages,
+            {'messages': [{'message_body': body} for body in bodies]},
+            pk=self.conversation.pk
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['message_ids']), 30)
+        self.assertEqual(
+            list(self.conversation.messages.order_by('sent_at', 'message_id').values_list('message_body', flat=True)),
+            bodies
+        )
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 30)
+        self.assertEqual(self.conversation.last_message_id, response.data['message_ids'][-1])
+
+    def test_bulk_across_conversations(self):
+        response = self.post(self.bulk, {'messages': [
+            {'conversation_id': str(self.conversation.pk), 'message_body': 'one'},
+            {'conversation_id': str(self.second.pk), 'message_body': 'two'},
+            {'conversation_id': str(self.second.pk), 'message_body': 'three'},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.message_count, 2)
+        self.assertEqual(self.second.last_message.message_body, 'three')
+
+    def test_bulk_rejects_foreign_conversations(self):
+        response = self.post(self.bulk, {'messages': [
+            {'conversation_id': str(self.conversation.pk), 'message_body': 'one'},
+            {'conversation_id': str(self.foreign.pk), 'message_body': 'two'},
+        ]})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['conversation_ids'], [self.foreign.pk])
+        self.assertFalse(Message.objects.exists())
+
+    @override_settings(CHATS_OFFENSIVE_TERMS=['darn'])
+    def test_offensive_messages_are_rejected(self):
+        response = self.post(
+            self.send_messages,
+            {'messages': [{'message_body': 'hello'}, {'message_body': 'oh DARN'}]},
+            pk=self.conversation.pk
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.post(
+            ConversationViewSet.as_view({'post': 'send_message'}, **ConversationViewSet.send_message.kwargs),
+            {'message_body': 'darn it'},
+            pk=self.conversation.pk
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('message_body', response.data)
+        self.assertFalse(Message.objects.exists())
+
+
+class MessageSearchTests(ChatsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Conversation.objects.create()
+        Message.objects.bulk_send([
+            Message(sender=self.user, conversation=self.conversation, message_body=body) for body in [
+                'Lunch at noon?',
+                'The café serves lunch, lunch and more lunch',
+                'Dinner tonight',
+            ]
+        ] + [Message(sender=self.user, conversation=self.other, message_body='lunch elsewhere')])
+
+    def bodies(self, queryset):
+        return [message.message_body for message in queryset]
+
+    def test_uses_fts5_on_sqlite(self):
+        self.assertIsInstance(get_search_backend(), SQLiteFTS5SearchBackend)
+
+    def test_ranked_prefix_matches(self):
+        messages = Message.objects.filter(conversation=self.conversation)
+        self.assertEqual(self.bodies(search_messages(messages, 'LUNCH')), [
+            'The café serves lunch, lunch and more lunch',
+            'Lunch at noon?',
+        ])
+        self.assertEqual(self.bodies(search_messages(messages, 'din')), ['Dinner tonight'])
+        self.assertEqual(self.bodies(search_messages(messages, 'cafe lunch')), [
+            'The café serves lunch, lunch and more lunch'
+        ])
+        self.assertEqual(self.bodies(search_messages(messages, '"* OR')), [])
+        self.assertEqual(self.bodies(search_messages(messages, '??')), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        messages = Message.objects.filter(conversation=self.conversation)
+        Message.objects.filter(message_body='Dinner tonight').update(message_body='Breakfast tomorrow')
+        self.assertEqual(self.bodies(search_messages(messages, 'dinner')), [])
+        self.assertEqual(self.bodies(search_messages(messages, 'breakfast')), ['Breakfast tomorrow'])
+        Message.objects.filter(message_body='Lunch at noon?').delete()
+        self.assertEqual(len(search_messages(messages, 'lunch')), 1)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO message_fts(message_fts) VALUES ('delete-all')")
+        self.assertEqual(len(search_messages(Message.objects.all(), 'lunch')), 0)
+        call_command('rebuild_message_search', stdout=StringIO())
+        self.assertEqual(len(search_messages(Message.objects.all(), 'lunch')), 3)
+
+    def test_missing_triggers_are_restored_after_migrate(self):
+        # What a migration rebuilding the message table leaves behind
+        with connection.cursor() as cursor:
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER message_fts_{trigger}')
+        self.assertFalse(SQLiteFTS5SearchBackend.is_available(connection))
+        Message.objects.create(sender=self.user, conversation=self.conversation, message_body='Brunch?')
+        install_search_index(sender=None, using='default')
+        self.assertTrue(SQLiteFTS5SearchBackend.is_available(connection))
+        self.assertEqual(self.bodies(search_messages(Message.objects.all(), 'brunch')), ['Brunch?'])
+
+    def test_substring_fallback(self):
+        messages = SearchBackend().search(Message.objects.all(), 'unch at')
+        self.assertEqual(self.bodies(messages), ['Lunch at noon?'])
+
+    def test_search_parameter(self):
+        request = self.factory.get('/api/messages/', {'search': 'lunch'})
+        force_authenticate(request, user=self.user)
+        response = MessageViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual([message['message_body'] for message in response.data['results']], [
+            'The café serves lunch, lunch and more lunch',
+            'Lunch at noon?',
+        ])
+        request = self.factory.get('/api/messages/', {'search': 'lunch', 'ordering': 'sent_at'})
+        force_authenticate(request, user=self.user)
+        response = MessageViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.data['results'][0]['message_body'], 'Lunch at noon?')
+
+
+class SearchMigrationTests(TransactionTestCase):
+    def test_partial_migrate_leaves_the_index_alone(self):
+        self.addCleanup(call_command, 'migrate', 'chats', verbosity=0)
+        call_command('migrate', 'chats', '0005', verbosity=0)
+        self.assertFalse(SQLiteFTS5SearchBackend.is_available(connection))
+        self.assertIs(type(get_search_backend()), SearchBackend)
+        # Other apps migrate without touching the message table
+        call_command('migrate', 'contenttypes', verbosity=0)
+        self.assertFalse(SQLiteFTS5SearchBackend.is_available(connection))
+        call_command('migrate', 'chats', verbosity=0)
+        self.assertTrue(SQLiteFTS5SearchBackend.is_available(connection))
+        self.assertIs(type(get_search_backend()), SQLiteFTS5SearchBackend)
+
+
+class CachedJWTUserTests(ChatsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = AccessToken()
+        self.token['user_id'] = str(self.user.user_id)
+        self.authentication = CustomJWTAuthentication()
+
+    def test_repeat_lookups_skip_the_database(self):
+        self.assertEqual(self.authentication.get_user(self.token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authentication.get_user(self.token), self.user)
+        local_users.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authentication.get_user(self.token), self.user)
+
+    def test_local_hits_skip_the_shared_cache(self):
+        self.authentication.get_user(self.token)
+        with mock.patch('chats.auth.cache') as shared:
+            for _ in range(10):
+                self.assertEqual(self.authentication.get_user(self.token), self.user)
+        self.assertFalse(shared.get.called)
+
+    def test_save_invalidates_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Alicia'
+            self.user.save()
+            # A concurrent request caches the row as it was before the commit
+            stale = User(user_id=self.user.user_id, first_name='Alice')
+            cache.set(f'chats:jwt-user:{self.user.user_id}:{user_cache_version(self.user.user_id)}', stale)
+        self.assertEqual(self.authentication.get_user(self.token).first_name, 'Alicia')
+
+    def test_returns_copies(self):
+        first = self.authentication.get_user(self.token)
+        first.first_name = 'Changed'
+        self.assertEqual(self.authentication.get_user(self.token).first_name, 'Alice')
+
+    def test_save_invalidates(self):
+        self.authentication.get_user(self.token)
+        self.user.first_name = 'Alicia'
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authentication.get_user(self.token).first_name, 'Alicia')
+
+    def test_deactivated_user_is_rejected(self):
+        self.authentication.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+
+    def test_unknown_user(self):
+        self.token['user_id'] = str(uuid.uuid4())
+        self.assertIsNone(self.authentication.get_user(self.token))
+
+
+class BufferedLogWriterTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'requests.log')
+
+    def read(self, path=None):
+        with open(path or self.path, encoding='utf-8') as log_file:
+            return log_file.read()
+
+    def test_writes_lines_in_order(self):
+        writer = BufferedLogWriter(self.path, batch_size=7)
+        lines = [f'line {i}\n' for i in range(100)]
+        for line in lines:
+            writer.write(line)
+        writer.flush()
+        self.assertEqual(self.read(), ''.join(lines))
+        writer.write('last\n')
+        writer.close()
+        self.assertTrue(self.read().endswith('last\n'))
+
+    def test_rotates_by_size(self):
+        writer = BufferedLogWriter(self.path, batch_size=1, max_bytes=100, backup_count=2)
+        for i in range(30):
+            writer.write(f'{i:09d}\n')
+        writer.close()
+        self.assertEqual(self.read(self.path + '.1'), ''.join(f'{i:09d}\n' for i in range(20, 30)))
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        self.assertEqual(self.read(), '')
+
+    def test_rotates_by_bytes_not_characters(self):
+        writer = BufferedLogWriter(self.path, batch_size=1, max_bytes=100)
+        # 19 bytes but 10 characters each
+        lines = ['\u00e9' * 9 + '\n'] * 6
+        for line in lines:
+            writer.write(line)
+        writer.close()
+        self.assertEqual(self.read(self.path + '.1'), ''.join(lines))
+        self.assertEqual(self.read(), '')
+
+    def test_drops_when_queue_is_full(self):
+        writer = BufferedLogWriter(self.path, max_queue=1)
+        # Without a writer thread nothing drains the queue
+        writer._pid = os.getpid()
+        writer.write('kept\n')
+        writer.write('dropped\n')
+        self.assertEqual(writer.dropped, 1)
+
+    def test_block_policy_waits_then_drops(self):
+        writer = BufferedLogWriter(self.path, max_queue=1, policy='block', block_timeout=0.01)
+        # Without a writer thread nothing drains the queue
+        writer._pid = os.getpid()
+        writer.write('kept\n')
+        writer.write('dropped\n')
+        self.assertEqual(writer.dropped, 1)
+
+    def test_recovers_from_write_errors(self):
+        path = os.path.join(os.path.dirname(self.path), 'missing', 'requests.log')
+        writer = BufferedLogWriter(path)
+        with self.assertLogs('chats.request_log', 'ERROR'):
+            writer.write('lost\n')
+            writer.flush()
+        self.assertEqual(writer.dropped, 1)
+        os.mkdir(os.path.dirname(path))
+        with self.assertLogs('chats.request_log', 'WARNING'):
+            writer.write('kept\n')
+            writer.close()
+        self.assertEqual(self.read(path), 'kept\n')
+
+    def test_flush_and_close_give_up_on_a_full_queue(self):
+        writer = BufferedLogWriter(self.path, max_queue=1)
+        writer._pid = os.getpid()
+        writer.write('queued\n')
+        self.assertFalse(writer.flush(timeout=0.01))
+        with self.assertLogs('chats.request_log', 'WARNING'):
+            writer.close(timeout=0.01)
+
+
+def ok(request):
+    return HttpResponse('ok')
+
+
+class ContentFilterTests(SimpleTestCase):
+    def test_words_and_phrases(self):
+        content_filter = ContentFilter(['Darn', 'heck', 'go away', 'go awayyy'])
+        self.assertEqual(content_filter.find('Well DARN it'), 'darn')
+        self.assertEqual(content_filter.find('please Go,  away'), 'go away')
+        self.assertEqual(content_filter.find('please go away now'), 'go away')
+        self.assertEqual(content_filter.find('go awayyy'), 'go awayyy')
+        self.assertIsNone(content_filter.find('darning and hecking'))
+        self.assertIsNone(content_filter.find('go on, away'))
+        self.assertFalse(ContentFilter([' ', '']))
+
+    def test_overlapping_phrases(self):
+        content_filter = ContentFilter(['a b c d', 'b c', 'x b c d e'])
+        # Fails over from the longer partial match to the phrase inside it
+        self.assertEqual(content_filter.find('x b c d f'), 'b c')
+        self.assertEqual(content_filter.find('a b c d'), 'b c')
+        self.assertIsNone(content_filter.find('a b x c d'))
+
+    def test_file_filter_reloads_when_changed(self):
+        now = [0.0]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'terms.txt')
+            with open(path, 'w') as terms_file:
+                terms_file.write('# comment\ndarn\n')
+            content_filter = FileContentFilter(path, ['heck'], check_interval=10, clock=lambda: now[0])
+            self.assertEqual(content_filter.find('oh darn'), 'darn')
+            self.assertEqual(content_filter.find('heck'), 'heck')
+            with open(path, 'w') as terms_file:
+                terms_file.write('drat\ngo away\n')
+            # Changes are noticed at the next check, not before
+            self.assertIsNone(content_filter.find('drat'))
+            now[0] = 11.0
+            self.assertEqual(content_filter.find('just go away'), 'go away')
+            self.assertIsNone(content_filter.find('oh darn'))
+            os.unlink(path)
+            now[0] = 22.0
+            # A missing file keeps the last terms loaded
+            with self.assertLogs('chats.content_filter', 'WARNING'):
+                self.assertEqual(content_filter.find('drat'), 'drat')
+
+    def test_get_content_filter(self):
+        with override_settings(CHATS_OFFENSIVE_TERMS=[]):
+            self.assertIsNone(get_content_filter())
+        with override_settings(CHATS_OFFENSIVE_TERMS=['darn']):
+            self.assertIs(get_content_filter(), get_content_filter())
+            self.assertEqual(get_content_filter().find('darn'), 'darn')
+
+
+class SlidingWindowLimiterTests(SimpleTestCase):
+    def test_limits_hits_per_window(self):
+        now = [1000.0]
+        limiter = SlidingWindowLimiter(3, 10, MemoryStore(), clock=lambda: now[0])
+        self.assertEqual([limiter.hit('ip')[0] for _ in range(4)], [True, True, True, False])
+        self.assertTrue(limiter.hit('other')[0])
+        # Halfway into the next window half of the previous hits still count
+        now[0] = 1015.0
+        self.assertEqual([limiter.hit('ip')[0] for _ in range(2)], [True, False])
+        now[0] = 1030.0
+        self.assertTrue(limiter.hit('ip')[0])
+
+
+class MiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def post(self, path, data):
+        return self.factory.post(path, json.dumps(data), content_type='application/json')
+
+    def test_restrict_access_by_time(self):
+        middleware = RestrictAccessByTimeMiddleware(ok)
+        request = self.factory.get('/api/conversations/')
+        with mock.patch('chats.middleware.datetime') as clock:
+            clock.now.return_value.hour = 19
+            self.assertEqual(middleware(request).status_code, 200)
+            clock.now.return_value.hour = 9
+            self.assertEqual(middleware(request).status_code, 403)
+        with override_settings(CHATS_ACCESS_HOURS=(0, 24)):
+            with self.assertRaises(MiddlewareNotUsed):
+                RestrictAccessByTimeMiddleware(ok)
+
+    @override_settings(CHATS_OFFENSIVE_TERMS=['darn'])
+    def test_offensive_language(self):
+        middleware = OffensiveLanguageMiddleware(ok)
+        self.assertEqual(middleware(self.post('/api/messages/', {'message_body': 'hello'})).status_code, 200)
+        self.assertEqual(middleware(self.post('/api/messages/', {'message_body': 'darn'})).status_code, 400)
+        self.assertEqual(middleware(self.post('/api/messages/', {'message_body': 'd\u0061rn'})).status_code, 400)
+        for escape in '\n\t\r\b\f':
+            body = {'message_body': f'well{escape}darn it'}
+            self.assertEqual(middleware(self.post('/api/messages/', body)).status_code, 400)
+        bulk = {'messages': [{'message_body': 'hi'}, {'message_body': 'oh darn'}]}
+        self.assertEqual(middleware(self.post('/api/messages/bulk/', bulk)).status_code, 400)
+        # Terms outside message bodies are not screened
+        self.assertEqual(middleware(self.post('/api/users/', {'last_name': 'Darn'})).status_code, 200)
+
+    @override_settings(CHATS_OFFENSIVE_TERMS=[])
+    def test_offensive_language_unused_without_terms(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            OffensiveLanguageMiddleware(ok)
+
+    @override_settings(CHATS_RATE_LIMIT={'limit': 2, 'window': 60})
+    def test_rate_limit(self):
+        middleware = RateLimitMiddleware(ok)
+        codes = [middleware(self.post('/api/messages/', {})).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        response = middleware(self.post('/api/conversations/abc/send_message/', {}))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(middleware(self.factory.get('/api/messages/')).status_code, 200)
+
+    @override_settings(CHATS_ROLE_PERMISSIONS={'/admin/': ['admin'], '/admin/reports/': ['admin', 'host']})
+    def test_role_permission(self):
+        middleware = RolePermissionMiddleware(ok)
+
+        def get(path, user):
+            request = self.factory.get(path)
+            request.user = user
+            return middleware(request).status_code
+
+        host = mock.Mock(is_authenticated=True, role='host')
+        admin = mock.Mock(is_authenticated=True, role='admin')
+        self.assertEqual(get('/admin/', AnonymousUser()), 403)
+        self.assertEqual(get('/admin/', host), 403)
+        self.assertEqual(get('/admin/', admin), 200)
+        self.assertEqual(get('/admin/reports/', host), 200)
+        self.assertEqual(get('/api/messages/', AnonymousUser()), 200)
+
+
+class TokenBucketTests(TestCase):
+    def check_store(self, store):
+        now = [1000.0]
+        limiter = TokenBucketLimiter(2.0, 3, store, clock=lambda: now[0])
+        key = f'test:{uuid.uuid4()}'
+        self.assertEqual([limiter.take(key)[0] for _ in range(4)], [True, True, True, False])
+        allowed, retry_after = limiter.take(key)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 0.5)
+        now[0] += 0.5
+        self.assertTrue(limiter.take(key)[0])
+        self.assertFalse(limiter.take(key)[0])
+        now[0] += 10
+        self.assertTrue(limiter.take(key, cost=3)[0])
+        self.assertEqual(limiter.take(key, cost=4), (False, None))
+
+    def test_memory_store(self):
+        self.check_store(MemoryBucketStore())
+
+    def test_cache_store(self):
+        self.check_store(CacheBucketStore())
+
+    def test_database_store(self):
+        self.check_store(DatabaseBucketStore())
+
+    def test_database_store_denies_when_racing(self):
+        store = DatabaseBucketStore()
+        self.assertEqual(store.take('test:race', 1, 1.0, 3, 1000.0), 2)
+        # Every conditional UPDATE loses to another worker
+        with mock.patch('django.db.models.QuerySet.update', return_value=0):
+            self.assertLess(store.take('test:race', 1, 1.0, 3, 1000.0), 0)
+        self.assertEqual(RateLimitBucket.objects.get(key='test:race').tokens, 2)
+
+
+@override_settings(CHATS_TOKEN_BUCKET={'rate': 0.5, 'capacity': 2, 'bulk_capacity': 3, 'backend': 'memory'})
+class MessageSendThrottleTests(ChatsTestCase):
+    def send(self):
+        request = self.factory.post('/api/conversations/', {
+            'sender_id': str(self.user.pk),
+            'conversation_id': str(self.conversation.pk),
+            'message_body': 'hello',
+        }, format='json')
+        force_authenticate(request, user=self.user)
+        # The router passes the @action options to as_view()
+        view = ConversationViewSet.as_view({'post': 'send_message'}, **ConversationViewSet.send_message.kwargs)
+        return view(request, pk=self.conversation.pk)
+
+    def test_send_message_is_throttled_with_retry_after(self):
+        self.assertEqual([self.send().status_code for _ in range(2)], [201, 201])
+        response = self.send()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(self.conversation.messages.count(), 2)
+
+    def test_message_create_is_throttled(self):
+        view = MessageViewSet.as_view({'post': 'create'})
+
+        def create():
+            request = self.factory.post('/api/messages/', {
+                'sender_id': str(self.user.pk),
+                'conversation_id': str(self.conversation.pk),
+                'message_body': 'hello',
+            }, format='json')
+            force_authenticate(request, user=self.user)
+            return view(request).status_code
+
+        self.assertEqual([create() for _ in range(3)], [201, 201, 429])
+
+    def send_messages(self, count):
+        request = self.factory.post('/api/', {
+            'messages': [{'message_body': f'message {i}'} for i in range(count)]
+        }, format='json')
+        force_authenticate(request, user=self.user)
+        view = ConversationViewSet.as_view({'post': 'send_messages'}, **ConversationViewSet.send_messages.kwargs)
+        return view(request, pk=self.conversation.pk)
+
+    def test_bulk_send_costs_one_token_per_message(self):
+        self.assertEqual(self.send_messages(2).status_code, 201)
+        response = self.send_messages(2)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(self.send_messages(1).status_code, 201)
+        self.assertEqual(self.conversation.messages.count(), 3)
+
+    def test_oversize_batch_is_rejected_with_the_maximum(self):
+        self.assertEqual(self.send_messages(1).status_code, 201)
+        response = self.send_messages(4)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['messages'], ['Send at most 3 messages per request'])
+        self.assertEqual(self.conversation.messages.count(), 1)
@@ -0,0 +1,73 @@
+# chats/throttling.py
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.exceptions import ValidationError
+from rest_framework.throttling import BaseThrottle
+
+from .ratelimit import TokenBucketLimiter, get_bucket_store
+
+
+class MessageSendThrottle(BaseThrottle):
+    """
+    Token-bucket throttle for the message sending endpoints, keyed per
+    user (or client IP when anonymous) and endpoint. Buckets live in the
+    backend named by CHATS_TOKEN_BUCKET so that every worker shares them;
+    a denied request gets 429 with Retry-After.
+    """
+    limiter = None
+    capacity_setting = 'capacity'
+    default_capacity = 10
+    
+    @classmethod
+    def get_limiter(cls):
+        if cls.limiter is None:
+            options = getattr(settings, 'CHATS_TOKEN_BUCKET', {})
+            cls.limiter = TokenBucketLimiter(
+                options.get('rate', 1.0),
+                options.get(cls.capacity_setting, cls.default_capacity),
+                get_bucket_store(options.get('backend', 'cache')),
+            )
+        return cls.limiter
+    
+    def get_cost(self, request):
+        return 1
+    
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        key = f'{view.basename}.{view.action}:{ident}'
+        allowed, self.retry_after = self.get_limiter().take(key, self.get_cost(request))
+        return allowed
+    
+    def wait(self):
+        return self.retry_after
+
+
+class BulkMessageSendThrottle(MessageSendThrottle):
+    """
+    MessageSendThrottle for the bulk endpoints, taking one token per
+    message from buckets of CHATS_TOKEN_BUCKET['bulk_capacity'].
+    A larger batch could never pass, so it is rejected with 400 rather
+    than 429; BulkMessageSerializer holds batches to the same maximum.
+    """
+    limiter = None
+    capacity_setting = 'bulk_capacity'
+    default_capacity = 1000
+    
+    def get_cost(self, request):
+        if isinstance(request.data, dict) and isinstance(request.data.get('messages'), list):
+            limit = int(self.get_limiter().capacity)
+            if len(request.data['messages']) > limit:
+                raise ValidationError({'messages': [f"Send at most {limit} messages per request"]})
+            return max(len(request.data['messages']), 1)
+        return 1
+
+
+@receiver(setting_changed)
+def reset_limiter(setting, **kwargs):
+    if setting == 'CHATS_TOKEN_BUCKET':
+        MessageSendThrottle.limiter = None
+        BulkMessageSendThrottle.limiter = None
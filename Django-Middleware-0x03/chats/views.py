@@ -3,22 +3,29 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Conversation, Message, User
+from .models import Conversation, ConversationRead, Message, User
 from .serializers import (
     ConversationSerializer, MessageSerializer, 
     ConversationCreateSerializer, MessageCreateSerializer,
-    UserSerializer, ConversationDetailSerializer
+    UserSerializer, ConversationDetailSerializer, ConversationListSerializer,
+    BulkMessageSerializer
 )
+from .membership import is_participant, member_conversation_ids
 from .permissions import IsParticipantOfConversation, IsMessageOwnerOrParticipant, IsOwnerOrReadOnly
-from .pagination import MessagePagination, ConversationPagination
+from .throttling import BulkMessageSendThrottle, MessageSendThrottle
+from .pagination import MessagePagination, ConversationPagination, get_message_paginator
 
 # Import filters conditionally to avoid circular imports
 try:
-    from .filters import MessageFilter, ConversationFilter
+    from .filters import MessageFilter, ConversationFilter, MessageSearchFilter
 except ImportError:
     MessageFilter = None
     ConversationFilter = None
+    MessageSearchFilter = filters.SearchFilter
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -41,7 +48,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsParticipantOfConversation]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
     search_fields = ['participants__first_name', 'participants__last_name', 'participants__email']
-    ordering_fields = ['created_at']
+    ordering_fields = ['created_at', 'updated_at', 'last_message_at']
     pagination_class = ConversationPagination
     
     # Set filterset_class conditionally
@@ -52,14 +59,40 @@ class ConversationViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'create':
             return ConversationCreateSerializer
+        elif self.action == 'list':
+            return ConversationListSerializer
         elif self.action == 'retrieve':
             return ConversationDetailSerializer
         return ConversationSerializer
     
     def get_queryset(self):
-        # Users can only see conversations they are participating in
-        return Conversation.objects.filter(participants=self.request.user)
+        # Users can only see conversations they are participating in; the
+        # cached membership set saves joining the participants table
+        queryset = Conversation.objects.filter(pk__in=member_conversation_ids(self.request))
+        if self.action == 'list':
+            # Summaries come from annotations; only participants are prefetched
+            queryset = queryset.with_summary().with_unread_count(self.request.user).prefetch_related('participants')
+        elif self.action == 'retrieve':
+            # Fixed number of queries however many messages are serialized
+            queryset = queryset.prefetch_related(
+                'participants',
+                Prefetch(
+                    'messages',
+                    queryset=Message.objects.select_related('sender').order_by('sent_at', 'message_id')
+                ),
+            )
+        return queryset
+    
+    def filter_queryset(self, queryset):
+        # ?ordering= may name annotations only the list queryset has, such
+        # as updated_at, and ordering a single object is moot anyway
+        for backend in self.filter_backends:
+            if self.action != 'list' and issubclass(backend, filters.OrderingFilter):
+                continue
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
     
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -75,25 +108,24 @@ class ConversationViewSet(viewsets.ModelViewSet):
         # Add the current user to participants if not already included
         if request.user.user_id not in participant_ids:
             participant_ids.append(request.user.user_id)
+        participant_ids = list(dict.fromkeys(participant_ids))
         
-        # Check if all users exist
-        users = []
-        for user_id in participant_ids:
-            try:
-                user = User.objects.get(user_id=user_id)
-                users.append(user)
-            except User.DoesNotExist:
-                return Response(
-                    {'error': f'User with ID {user_id} does not exist'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        # Check that all users exist, reporting every missing ID at once
+        missing_ids = User.objects.missing_ids(participant_ids)
+        if missing_ids:
+            return Response(
+                {
+                    'error': f"Users with IDs {', '.join(map(str, missing_ids))} do not exist",
+                    'missing_ids': missing_ids
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Create the conversation
         conversation = Conversation.objects.create()
         
-        # Add participants to the conversation
-        for user in users:
-            conversation.participants.add(user)
+        # Add all participants with a single bulk insert
+        conversation.participants.add(*participant_ids)
         
         # If there's an initial message, create it
         initial_message = serializer.validated_data.get('initial_message', '')
@@ -103,12 +135,16 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 conversation=conversation,
                 message_body=initial_message
             )
+            # Pick up the counters chats.signals just updated
+            conversation.refresh_from_db(fields=['last_message', 'last_message_at', 'message_count'])
         
         # Return the created conversation with full details
         full_serializer = ConversationSerializer(conversation, context={'request': request})
         return Response(full_serializer.data, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsParticipantOfConversation])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsParticipantOfConversation],
+            throttle_classes=[MessageSendThrottle])
+    @transaction.atomic
     def send_message(self, request, pk=None):
         """Send a message to an existing conversation"""
         conversation = self.get_object()
@@ -129,25 +165,53 @@ class ConversationViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsParticipantOfConversation],
+            throttle_classes=[BulkMessageSendThrottle])
+    def send_messages(self, request, pk=None):
+        """Send a batch of messages to an existing conversation"""
+        conversation = self.get_object()
+        serializer = BulkMessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        messages = Message.objects.bulk_send(
+            Message(sender=request.user, conversation=conversation, message_body=item['message_body'])
+            for item in serializer.validated_data['messages']
+        )
+        return Response(
+            {'message_ids': [message.message_id for message in messages]},
+            status=status.HTTP_201_CREATED
+        )
+    
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsParticipantOfConversation])
     def messages(self, request, pk=None):
         """Get all messages for a specific conversation"""
         conversation = self.get_object()
-        messages = conversation.messages.all()
+        messages = conversation.messages.select_related('sender')
         
-        # Apply pagination
-        paginator = MessagePagination()
+        # Apply pagination (?pagination=cursor for keyset pages)
+        paginator = get_message_paginator(request)
         paginated_messages = paginator.paginate_queryset(messages, request, view=self)
         serializer = MessageSerializer(paginated_messages, many=True)
         return paginator.get_paginated_response(serializer.data)
     
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsParticipantOfConversation])
+    def read(self, request, pk=None):
+        """Mark the conversation as read, resetting its unread count"""
+        conversation = self.get_object()
+        ConversationRead.objects.update_or_create(
+            conversation=conversation,
+            user=request.user,
+            defaults={'last_read_at': timezone.now()}
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
     def update(self, request, *args, **kwargs):
         """Override update to check conversation_id and return 403 if not participant"""
         conversation = self.get_object()
         conversation_id = conversation.conversation_id
         
-        # Check if user is participant (permission class should handle this, but double-check)
-        if not conversation.participants.filter(user_id=request.user.user_id).exists():
+        # Check if user is participant (answered from the permission check's cache)
+        if not is_participant(request, conversation):
             return Response(
                 {'error': 'You are not a participant of this conversation'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -160,8 +224,8 @@ class ConversationViewSet(viewsets.ModelViewSet):
         conversation = self.get_object()
         conversation_id = conversation.conversation_id
         
-        # Check if user is participant (permission class should handle this, but double-check)
-        if not conversation.participants.filter(user_id=request.user.user_id).exists():
+        # Check if user is participant (answered from the permission check's cache)
+        if not is_participant(request, conversation):
             return Response(
                 {'error': 'You are not a participant of this conversation'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -173,8 +237,9 @@ class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated, IsMessageOwnerOrParticipant]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
-    search_fields = ['message_body', 'sender__first_name', 'sender__last_name']
+    filter_backends = [MessageSearchFilter, filters.OrderingFilter, DjangoFilterBackend]
+    # Full-text, ranked; ?ordering= overrides the rank order
+    search_fields = ['@message_body']
     ordering_fields = ['sent_at']
     pagination_class = MessagePagination
     
@@ -183,6 +248,19 @@ class MessageViewSet(viewsets.ModelViewSet):
     def filterset_class(self):
         return MessageFilter if MessageFilter else None
     
+    @property
+    def paginator(self):
+        # Keyset pages when the client asks for ?pagination=cursor
+        if not hasattr(self, '_paginator'):
+            descending = self.request.query_params.get('ordering') == '-sent_at'
+            self._paginator = get_message_paginator(self.request, descending=descending)
+        return self._paginator
+    
+    def get_throttles(self):
+        if self.action == 'create':
+            return [MessageSendThrottle()]
+        return super().get_throttles()
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return MessageCreateSerializer
@@ -190,9 +268,12 @@ class MessageViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         # Users can only see messages from conversations they are participating in
-        user_conversations = Conversation.objects.filter(participants=self.request.user)
-        return Message.objects.filter(conversation__in=user_conversations)
+        # The membership set also answers the object permission checks for free
+        return Message.objects.filter(
+            conversation_id__in=member_conversation_ids(self.request)
+        ).select_related('sender')
     
+    @transaction.atomic
     def perform_create(self, serializer):
         # Automatically set the sender to the current user
         serializer.save(sender=self.request.user)
@@ -200,10 +281,10 @@ class MessageViewSet(viewsets.ModelViewSet):
     def update(self, request, *args, **kwargs):
         """Override update to check conversation_id and return 403 if not owner"""
         message = self.get_object()
-        conversation_id = message.conversation.conversation_id
+        conversation_id = message.conversation_id
         
         # Check if user is the message owner
-        if message.sender != request.user:
+        if message.sender_id != request.user.pk:
             return Response(
                 {'error': 'You can only update your own messages'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -214,10 +295,10 @@ class MessageViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """Override destroy to check conversation_id and return 403 if not owner"""
         message = self.get_object()
-        conversation_id = message.conversation.conversation_id
+        conversation_id = message.conversation_id
         
         # Check if user is the message owner
-        if message.sender != request.user:
+        if message.sender_id != request.user.pk:
             return Response(
                 {'error': 'You can only delete your own messages'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -225,13 +306,51 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         return super().destroy(request, *args, **kwargs)
     
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Keeps the conversation counters in step with the delete
+        instance.delete()
+    
+    @action(detail=False, methods=['post'], throttle_classes=[BulkMessageSendThrottle])
+    def bulk(self, request):
+        """Send a batch of messages, each to a conversation given by conversation_id"""
+        serializer = BulkMessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['messages']
+        
+        if any('conversation_id' not in item for item in items):
+            return Response(
+                {'error': 'Every message needs a conversation_id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # One membership lookup for the whole batch
+        member_ids = member_conversation_ids(request)
+        foreign_ids = list(dict.fromkeys(
+            item['conversation_id'] for item in items if item['conversation_id'] not in member_ids
+        ))
+        if foreign_ids:
+            return Response(
+                {'error': 'You are not a participant of these conversations', 'conversation_ids': foreign_ids},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        messages = Message.objects.bulk_send(
+            Message(sender=request.user, conversation_id=item['conversation_id'], message_body=item['message_body'])
+            for item in items
+        )
+        return Response(
+            {'message_ids': [message.message_id for message in messages]},
+            status=status.HTTP_201_CREATED
+        )
+    
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Get recent messages with pagination"""
         recent_messages = self.get_queryset().order_by('-sent_at')
         
-        # Apply pagination
-        paginator = MessagePagination()
+        # Apply pagination (?pagination=cursor for keyset pages)
+        paginator = get_message_paginator(request, descending=True)
         paginated_messages = paginator.paginate_queryset(recent_messages, request, view=self)
         serializer = MessageSerializer(paginated_messages, many=True)
         return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
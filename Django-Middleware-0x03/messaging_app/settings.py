@@ -35,6 +35,57 @@ MIDDLEWARE = [
     'chats.middleware.RolePermissionMiddleware',
 ]
 
+# Options of chats.request_log.BufferedLogWriter for RequestLoggingMiddleware
+CHATS_REQUEST_LOG = {
+    'path': 'requests.log',
+    'max_queue': 10000,
+    'flush_interval': 1.0,
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'policy': 'drop',
+}
+
+# Hours (local time) during which the chat can be used
+CHATS_ACCESS_HOURS = (18, 21)
+
+# Terms rejected in message bodies by OffensiveLanguageMiddleware and the
+# message serializers, plus an optional file of terms (one per line) that
+# is reloaded when it changes, checked every RELOAD_INTERVAL seconds
+CHATS_OFFENSIVE_TERMS = []
+CHATS_OFFENSIVE_TERMS_FILE = None
+CHATS_OFFENSIVE_TERMS_RELOAD_INTERVAL = 5.0
+
+# Full-text search of message bodies (chats.search): None picks FTS5 on
+# SQLite and tsvector on PostgreSQL; the text search configuration is
+# used by PostgreSQL only
+CHATS_SEARCH_BACKEND = None
+CHATS_SEARCH_CONFIG = 'english'
+
+# Message sends allowed per client IP; 'backend': 'cache' shares the
+# counters between workers through CACHES
+CHATS_RATE_LIMIT = {
+    'limit': 5,
+    'window': 60,
+    'backend': 'memory',
+}
+
+# Token buckets throttling message sends per user and endpoint: 'rate'
+# tokens per second up to 'capacity'. The bulk endpoints take a token
+# per message, up to 'bulk_capacity', which is also the most messages
+# one bulk request may carry. 'backend' is 'cache' (shared through
+# CACHES), 'database' (the rate_limit_bucket table) or 'memory'
+CHATS_TOKEN_BUCKET = {
+    'rate': 1.0,
+    'capacity': 10,
+    'bulk_capacity': 1000,
+    'backend': 'cache',
+}
+
+# Path prefixes and the user roles allowed to use them
+CHATS_ROLE_PERMISSIONS = {
+    '/admin/': ['admin'],
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -60,6 +111,21 @@ DATABASES = {
     }
 }
 
+# Use a shared backend (Redis, Memcached) when running several processes,
+# so cache invalidations reach every worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds a user's conversation membership set stays cached
+CHATS_MEMBERSHIP_CACHE_TIMEOUT = 300
+
+# Seconds a JWT-authenticated user stays cached, shared and per process
+CHATS_JWT_USER_CACHE_TIMEOUT = 60
+CHATS_JWT_USER_LOCAL_CACHE_TIMEOUT = 5
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True